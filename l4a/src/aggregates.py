@@ -0,0 +1,321 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from gridder import getCoordinates, getCellIndices, dropNonFinite
+
+
+def getCells( ix, iy ):
+
+    """
+    unique cells and inverse mapping of rows onto cells
+    """
+
+    cells, inverse = np.unique( np.stack( [ ix, iy ], axis=1 ), axis=0, return_inverse=True )
+    return cells.reshape( -1, 2 ), inverse.ravel()
+
+
+def getSummaries( df, cell_size, columns, edges, origin=( 0.0, 0.0 ), crs=None ):
+
+    """
+    mergeable per cell summaries - count, sum, sum of squares, min, max and fixed bin histogram sketch
+    """
+
+    x, y, crs = getCoordinates( df, crs )
+    df, x, y = dropNonFinite( df, x, y )
+    cells, inverse = getCells( *getCellIndices( x, y, cell_size, origin ) )
+
+    n = len( cells )
+    data = { 'ix' : cells[ :, 0 ], 'iy' : cells[ :, 1 ] }
+    for name in columns:
+
+        # null values excluded from column summaries
+        values = df[ name ].to_numpy( dtype=np.float64 )
+        valid = ~np.isnan( values )
+        idx, values = inverse[ valid ], values[ valid ]
+
+        data[ f'{name}_count' ] = np.bincount( idx, minlength=n ).astype( np.int64 )
+        data[ f'{name}_sum' ] = np.bincount( idx, weights=values, minlength=n )
+        data[ f'{name}_sumsq' ] = np.bincount( idx, weights=values * values, minlength=n )
+
+        data[ f'{name}_min' ] = np.full( n, np.inf )
+        np.minimum.at( data[ f'{name}_min' ], idx, values )
+        data[ f'{name}_max' ] = np.full( n, -np.inf )
+        np.maximum.at( data[ f'{name}_max' ], idx, values )
+
+        # shared bin edges - out of range values clipped into end bins
+        bins = len( edges[ name ] ) - 1
+        pos = np.clip( np.searchsorted( edges[ name ], values, side='right' ) - 1, 0, bins - 1 )
+        counts = np.bincount( idx * bins + pos, minlength=n * bins ).reshape( n, bins )
+        data[ f'{name}_hist' ] = list( counts.astype( np.int32 ) )
+
+    return pd.DataFrame( data )
+
+
+def reduceSummaries( df, columns, factor=1 ):
+
+    """
+    merge summaries of rows sharing cell - factor > 1 rolls cells up into coarser grid
+    """
+
+    if len( df ) == 0:
+        return df
+
+    ix, iy = df[ 'ix' ].to_numpy(), df[ 'iy' ].to_numpy()
+    if factor > 1:
+        ix, iy = np.floor_divide( ix, factor ), np.floor_divide( iy, factor )
+
+    cells, inverse = getCells( ix, iy )
+
+    n = len( cells )
+    data = { 'ix' : cells[ :, 0 ], 'iy' : cells[ :, 1 ] }
+    for name in columns:
+
+        # additive summaries
+        for stat in [ 'count', 'sum', 'sumsq' ]:
+            data[ f'{name}_{stat}' ] = np.bincount( inverse, weights=df[ f'{name}_{stat}' ].to_numpy(), minlength=n )
+        data[ f'{name}_count' ] = data[ f'{name}_count' ].astype( np.int64 )
+
+        data[ f'{name}_min' ] = np.full( n, np.inf )
+        np.minimum.at( data[ f'{name}_min' ], inverse, df[ f'{name}_min' ].to_numpy() )
+        data[ f'{name}_max' ] = np.full( n, -np.inf )
+        np.maximum.at( data[ f'{name}_max' ], inverse, df[ f'{name}_max' ].to_numpy() )
+
+        # histogram sketches merge by bin wise addition
+        hist = np.vstack( df[ f'{name}_hist' ].to_numpy() )
+        counts = np.zeros( ( n, hist.shape[ 1 ] ), dtype=np.int64 )
+        np.add.at( counts, inverse, hist )
+        data[ f'{name}_hist' ] = list( counts.astype( np.int32 ) )
+
+    return pd.DataFrame( data )
+
+
+def getStatistics( df, columns, edges, cell_size, origin=( 0.0, 0.0 ), quantiles=( 0.5, ) ):
+
+    """
+    cell statistics from summaries - mean, stdev and histogram interpolated quantiles
+    """
+
+    out = pd.DataFrame( { 'ix' : df[ 'ix' ], 'iy' : df[ 'iy' ] } )
+    out[ 'x' ] = origin[ 0 ] + ( out[ 'ix' ] + 0.5 ) * cell_size
+    out[ 'y' ] = origin[ 1 ] + ( out[ 'iy' ] + 0.5 ) * cell_size
+
+    for name in columns:
+
+        count = df[ f'{name}_count' ].to_numpy().astype( np.float64 )
+        with np.errstate( invalid='ignore', divide='ignore' ):
+            mean = df[ f'{name}_sum' ].to_numpy() / count
+            var = np.maximum( df[ f'{name}_sumsq' ].to_numpy() / count - mean * mean, 0.0 )
+
+        out[ f'{name}_count' ] = df[ f'{name}_count' ]
+        out[ f'{name}_mean' ] = mean
+        out[ f'{name}_stdev' ] = np.sqrt( var )
+        out[ f'{name}_min' ] = df[ f'{name}_min' ].where( count > 0 )
+        out[ f'{name}_max' ] = df[ f'{name}_max' ].where( count > 0 )
+
+        hist = np.vstack( df[ f'{name}_hist' ].to_numpy() ) if len( df ) else np.zeros( ( 0, len( edges[ name ] ) - 1 ) )
+        for q in quantiles:
+            label = 'median' if q == 0.5 else f'q{int( round( q * 100 ) )}'
+            value = getQuantile( hist, np.asarray( edges[ name ] ), q )
+            out[ f'{name}_{label}' ] = np.clip( value, out[ f'{name}_min' ], out[ f'{name}_max' ] )
+
+    return out
+
+
+def getQuantile( hist, edges, q ):
+
+    """
+    vectorised quantile per row by linear interpolation within histogram bin
+    """
+
+    cum = hist.cumsum( axis=1 )
+    total = cum[ :, -1 ] if hist.shape[ 1 ] else np.zeros( len( hist ) )
+    target = q * total
+
+    # first bin reaching target rank
+    idx = np.argmax( cum >= target[ :, None ], axis=1 )
+    rows = np.arange( len( hist ) )
+    before = np.where( idx > 0, cum[ rows, np.maximum( idx - 1, 0 ) ], 0 )
+
+    with np.errstate( invalid='ignore', divide='ignore' ):
+        frac = np.clip( ( target - before ) / hist[ rows, idx ], 0.0, 1.0 )
+
+    value = edges[ idx ] + frac * ( edges[ idx + 1 ] - edges[ idx ] )
+    return np.where( total > 0, value, np.nan )
+
+
+class AggregateStore():
+
+    # default histogram sketch resolution - int32 counts held per cell per column so kept coarse
+    bins = 256
+
+    # plausible physical value ranges - sketch edges fixed before first load
+    ranges = {  'agbd' : ( 0.0, 1000.0 ) }
+
+
+    def __init__( self, path ):
+
+        """
+        constructor
+        """
+
+        # one folder per aoi - summaries per cell size plus json metadata
+        self._path = path
+        os.makedirs( path, exist_ok=True )
+        return
+
+
+    def update( self, aoi, df, cell_sizes, columns, source=None, ranges=None, origin=( 0.0, 0.0 ), crs=None ):
+
+        """
+        merge batch of points into summaries at each cell size - coarser sizes rolled up from finest
+        """
+
+        metadata = self.getMetadata( aoi )
+
+        # batches identified by source loaded once only
+        if source is not None and source in metadata[ 'sources' ]:
+            return False
+
+        # fix grid + sketch layout on first update
+        metadata.setdefault( 'origin', list( origin ) )
+        metadata.setdefault( 'crs', str( crs ) if crs is not None else None )
+        for name in columns:
+            if name not in metadata[ 'edges' ]:
+                metadata[ 'edges' ][ name ] = self.getEdges( name, ranges )
+
+        # finest resolution computed from points - coarser resolutions must be integer multiples
+        cell_sizes = sorted( cell_sizes )
+        finest = cell_sizes[ 0 ]
+        for cell_size in cell_sizes[ 1: ]:
+            if cell_size % finest != 0:
+                raise ValueError( f'cell size {cell_size} not a multiple of {finest}' )
+
+        batch = getSummaries( df, finest, columns, metadata[ 'edges' ], origin=metadata[ 'origin' ], crs=crs )
+
+        staged = []
+        for cell_size in cell_sizes:
+
+            # roll batch up to resolution then merge with stored summaries
+            summaries = reduceSummaries( batch, columns, factor=int( cell_size // finest ) )
+            existing = self.read( aoi, cell_size, statistics=False )
+            if existing is not None:
+
+                if set( self.getColumns( existing ) ) != set( columns ):
+                    raise ValueError( f'columns {columns} differ from summaries held for {aoi} at {cell_size}' )
+
+                summaries = reduceSummaries( pd.concat( [ existing, summaries ], ignore_index=True ), self.getColumns( existing ) )
+
+            # stage merged summaries - stored summaries untouched until every resolution written
+            pathname = self.getPathname( aoi, cell_size )
+            summaries.to_parquet( pathname + '.tmp', index=False )
+            staged.append( pathname )
+
+        if source is not None:
+            metadata[ 'sources' ].append( source )
+
+        # swap in all resolutions then metadata recording source - failed batch leaves store unchanged for retry
+        for pathname in staged:
+            os.replace( pathname + '.tmp', pathname )
+
+        self.setMetadata( aoi, metadata )
+        return True
+
+
+    def coarsen( self, aoi, cell_size, factor ):
+
+        """
+        build coarser resolution from stored finer summaries
+        """
+
+        summaries = self.read( aoi, cell_size, statistics=False )
+        if summaries is None:
+            raise ValueError( f'no summaries held for {aoi} at {cell_size}' )
+
+        summaries = reduceSummaries( summaries, self.getColumns( summaries ), factor=factor )
+        summaries.to_parquet( self.getPathname( aoi, cell_size * factor ), index=False )
+
+        return summaries
+
+
+    def read( self, aoi, cell_size, statistics=True, quantiles=( 0.5, ) ):
+
+        """
+        read summaries or derived statistics for aoi and cell size - None if not held
+        """
+
+        pathname = self.getPathname( aoi, cell_size )
+        if not os.path.exists( pathname ):
+            return None
+
+        df = pd.read_parquet( pathname )
+        if not statistics:
+            return df
+
+        metadata = self.getMetadata( aoi )
+        return getStatistics( df, self.getColumns( df ), metadata[ 'edges' ], cell_size, origin=metadata[ 'origin' ], quantiles=quantiles )
+
+
+    def getMetadata( self, aoi ):
+
+        """
+        aoi metadata - bin edges, grid origin and loaded sources
+        """
+
+        pathname = os.path.join( self._path, aoi, 'metadata.json' )
+        if not os.path.exists( pathname ):
+            return { 'edges' : {}, 'sources' : [] }
+
+        with open( pathname, 'r' ) as f:
+            return json.load( f )
+
+
+    def setMetadata( self, aoi, metadata ):
+
+        """
+        write aoi metadata
+        """
+
+        # write then rename - readers never see partial metadata
+        pathname = os.path.join( self._path, aoi, 'metadata.json' )
+        with open( pathname + '.tmp', 'w' ) as f:
+            json.dump( metadata, f, indent=4 )
+
+        os.replace( pathname + '.tmp', pathname )
+        return
+
+
+    def getPathname( self, aoi, cell_size ):
+
+        """
+        summaries pathname for aoi and cell size
+        """
+
+        os.makedirs( os.path.join( self._path, aoi ), exist_ok=True )
+        return os.path.join( self._path, aoi, '{:g}.parquet'.format( cell_size ) )
+
+
+    @staticmethod
+    def getColumns( df ):
+
+        """
+        value columns held in summaries
+        """
+
+        return [ name[ : -len( '_count' ) ] for name in df.columns if name.endswith( '_count' ) ]
+
+
+    @staticmethod
+    def getEdges( name, ranges=None, bins=None ):
+
+        """
+        evenly spaced bin edges over fixed physical range of column - never derived from data
+        """
+
+        ranges = { **AggregateStore.ranges, **( ranges or {} ) }
+        if name not in ranges:
+            raise ValueError( f'no value range for {name} - supply ( min, max ) covering all future loads' )
+
+        lo, hi = ranges[ name ]
+        return np.linspace( lo, hi, ( bins or AggregateStore.bins ) + 1 ).tolist()
@@ -0,0 +1,308 @@
+import time
+import h5py
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from gedil4a import GediL4a
+
+
+def createGranule( pathname, shots, variables ):
+
+    """
+    create synthetic l4a granule with beam groups of 1d and 2d datasets
+    """
+
+    rng = np.random.default_rng( 0 )
+    with h5py.File( pathname, 'w' ) as hf:
+
+        for beam in [ 'BEAM0000', 'BEAM0001', 'BEAM0010', 'BEAM0011', 'BEAM0101', 'BEAM0110', 'BEAM1000', 'BEAM1011' ]:
+
+            group = hf.create_group( beam )
+            group.create_dataset( 'shot_number', data=np.arange( shots, dtype=np.uint64 ) )
+
+            # mixture of float / integer 1d datasets
+            for idx in range( variables ):
+                if idx % 4 == 0:
+                    group.create_dataset( f'flag_{idx}', data=rng.integers( 0, 2, shots, dtype=np.uint8 ) )
+                else:
+                    group.create_dataset( f'var_{idx}', data=rng.random( shots, dtype=np.float32 ) )
+
+            # 2d covariance datasets
+            group.create_dataset( 'xvar', data=rng.random( ( shots, 4 ), dtype=np.float32 ) )
+            group.create_dataset( 'agbd_prediction_cov', data=rng.random( ( shots, 9 ), dtype=np.float32 ) )
+
+    return pathname
+
+
+def getGroupDataLegacy( group ):
+
+    """
+    row-major list based reader - reference implementation
+    """
+
+    names, values = [], []
+    for key, value in group.items():
+
+        if not isinstance( value, h5py.Group ):
+
+            if ( len(value.shape) == 1 ):
+                names.append( key )
+                values.append( value[:].tolist() )
+            else:
+                if ( len(value.shape) == 2 ):
+                    for idx in range( value.shape[1] ):
+                        names.append( key + '_' + str( idx + 1 ) )
+                        values.append( value[:, idx].tolist() )
+
+    return pd.DataFrame( map(list, zip(*values)), columns=names )
+
+
+def measure( func, *args, trace=True ):
+
+    """
+    return result, elapsed seconds and peak traced memory of function call
+    """
+
+    # untraced timing run - tracemalloc overhead scales with allocation count
+    start = time.perf_counter()
+    result = func( *args )
+    elapsed = time.perf_counter() - start
+
+    # separate traced run for peak memory
+    peak = None
+    if trace:
+        tracemalloc.start()
+        func( *args )
+        peak = tracemalloc.get_traced_memory()[ 1 ]
+        tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+def benchmarkGroupData( pathname, repeat ):
+
+    """
+    compare columnar and legacy group readers over all beams in granule
+    """
+
+    obj = GediL4a( pathname )
+    groups = [ obj._hf.get( key ) for key in obj._hf.keys() if key.startswith( 'BEAM' ) ]
+
+    def columnar():
+        return [ obj.getGroupData( group ) for group in groups ]
+
+    def legacy():
+        return [ getGroupDataLegacy( group ) for group in groups ]
+
+    for name, func in [ ( 'legacy', legacy ), ( 'columnar', columnar ) ]:
+
+        timings, peaks = [], []
+        for _ in range( repeat ):
+            frames, elapsed, peak = measure( func )
+            timings.append( elapsed )
+            peaks.append( peak )
+
+        rows = sum( len( df ) for df in frames )
+        memory = sum( df.memory_usage( deep=True ).sum() for df in frames )
+        print( f'{name:>10}: {min( timings ):8.3f}s  peak {max( peaks ) / 1e6:8.1f}MB  frame {memory / 1e6:8.1f}MB  rows {rows}' )
+
+    return
+
+
+def createResponse( items, bands ):
+
+    """
+    create synthetic statistical api response
+    """
+
+    rng = np.random.default_rng( 0 )
+    data = []
+    for idx in range( items ):
+
+        stats = {}
+        for band in range( bands ):
+            values = rng.random( 6 ).tolist()
+            stats[ f'b{band}' ] = { 'stats' : { 'min' : values[ 0 ], 
+                                                'max' : values[ 1 ], 
+                                                'mean' : values[ 2 ], 
+                                                'stDev' : values[ 3 ], 
+                                                'sampleCount' : 9, 
+                                                'noDataCount' : 0, 
+                                                'percentiles' : { '10.0' : values[ 4 ], '90.0' : values[ 5 ] } } }
+
+        data.append( { 'interval' : { 'from' : '2020-01-01T00:00:00Z', 'to' : '2020-01-02T00:00:00Z' },
+                       'outputs' : { 'stats' : { 'bands' : stats } } } )
+
+    return { 'data' : data }
+
+
+def benchmarkStatsParser( files, bands, repeat ):
+
+    """
+    compare compiled and generic parsers over per-shot batch files of 5 - 40 intervals
+    """
+
+    from loader import convertToDataFrame
+    from statsparser import StatsParser, concatColumns
+
+    # one response per shot file
+    rng = np.random.default_rng( 0 )
+    responses = [ createResponse( int( items ), bands ) for items in rng.integers( 5, 41, files ) ]
+    parser = StatsParser()
+
+    def generic():
+        frames = []
+        for shot_number, response in enumerate( responses ):
+            df = convertToDataFrame( response )
+            df.insert( 0, 'shot_number', shot_number )
+            frames.append( df )
+        return pd.concat( frames, ignore_index=True )
+
+    def compiled():
+        frames = []
+        for shot_number, response in enumerate( responses ):
+            columns = parser.parseColumns( response )
+            n = len( columns[ 'interval_from' ] )
+            frames.append( { 'shot_number' : np.full( n, shot_number ), **columns } )
+        return pd.DataFrame( concatColumns( frames ) )
+
+    for name, func in [ ( 'generic', generic ), ( 'compiled', compiled ) ]:
+
+        timings = []
+        for _ in range( repeat ):
+            df, elapsed, peak = measure( func, trace=False )
+            timings.append( elapsed )
+
+        print( f'{name:>10}: {min( timings ):8.3f}s  rows {len( df )}  columns {len( df.columns )}' )
+
+    return
+
+
+def benchmarkFootprints( shots, repeat ):
+
+    """
+    compare geopandas reproject + buffer with cached transformer + vectorised buffer
+    """
+
+    import geopandas as gpd
+    from footprint import getFootprints
+
+    # synthetic shots within single utm zone
+    rng = np.random.default_rng( 0 )
+    lon, lat = rng.uniform( 36.0, 37.0, shots ), rng.uniform( -1.0, 0.0, shots )
+    gdf = gpd.GeoDataFrame( { 'shot_number' : np.arange( shots ) }, geometry=gpd.points_from_xy( lon, lat ), crs='EPSG:4326' )
+
+    def legacy():
+        subset = gdf.copy()
+        subset = subset.to_crs( subset.estimate_utm_crs() )
+        return subset.geometry.buffer( 30 )
+
+    def vectorised():
+        return getFootprints( gdf.geometry.x.values, gdf.geometry.y.values, 32737 )
+
+    for name, func in [ ( 'legacy', legacy ), ( 'vectorised', vectorised ) ]:
+
+        timings = []
+        for _ in range( repeat ):
+            footprints, elapsed, peak = measure( func, trace=False )
+            timings.append( elapsed )
+
+        print( f'{name:>10}: {min( timings ):8.3f}s  footprints {len( footprints )}' )
+
+    return
+
+
+def benchmarkGrid( shots, cell_size, repeat ):
+
+    """
+    compare polygon grid + sjoin + dissolve with floor division binning
+    """
+
+    import shapely
+    import geopandas as gpd
+    from gridder import aggregateCells
+
+    # synthetic shots in projected coordinates
+    rng = np.random.default_rng( 0 )
+    x, y = rng.uniform( 0, 50000, shots ), rng.uniform( 0, 50000, shots )
+    gdf = gpd.GeoDataFrame( { 'agbd' : rng.gamma( 2.0, 30.0, shots ), 'ndvi_mean' : rng.random( shots ) },
+                            geometry=gpd.points_from_xy( x, y ), 
+                            crs='EPSG:3857' )
+
+    def legacy():
+        xmin, ymin, xmax, ymax = gdf.total_bounds
+        cells = [ shapely.geometry.box( x0, y0, x0 + cell_size, y0 + cell_size ) 
+                    for x0 in np.arange( xmin, xmax + cell_size, cell_size ) 
+                        for y0 in np.arange( ymin, ymax + cell_size, cell_size ) ]
+        grid = gpd.GeoDataFrame( geometry=cells, crs=gdf.crs )
+        merge = gpd.sjoin( gdf, grid, how='left', predicate='within' )
+        return merge.dissolve( by='index_right', aggfunc='median' ), merge.dissolve( by='index_right', aggfunc='count' )
+
+    def vectorised():
+        return aggregateCells( gdf, cell_size, columns=[ 'agbd', 'ndvi_mean' ] )
+
+    for name, func in [ ( 'legacy', legacy ), ( 'vectorised', vectorised ) ]:
+
+        timings = []
+        for _ in range( repeat ):
+            result, elapsed, peak = measure( func )
+            timings.append( elapsed )
+
+        print( f'{name:>10}: {min( timings ):8.3f}s  peak {peak / 1e6:8.1f}MB' )
+
+    return
+
+
+def parseArguments(args=None):
+
+    """
+    parse arguments
+    """
+
+    # parse command line arguments
+    parser = argparse.ArgumentParser(description='benchmark')
+    parser.add_argument('--repeat', type=int, help='repetitions', default=3 )
+    subparsers = parser.add_subparsers( dest='command', required=True )
+
+    # l4a group reader
+    group = subparsers.add_parser( 'groupdata', help='columnar vs legacy hdf5 group reader' )
+    group.add_argument('pathname', action='store', help='synthetic granule pathname' )
+    group.add_argument('--shots', type=int, help='shots per beam', default=100000 )
+    group.add_argument('--variables', type=int, help='1d datasets per beam', default=100 )
+
+    # statistical api response parser
+    stats = subparsers.add_parser( 'stats', help='compiled vs generic response parser' )
+    stats.add_argument('--files', type=int, help='per-shot response files', default=5000 )
+    stats.add_argument('--bands', type=int, help='bands per output', default=6 )
+
+    # footprint generation
+    footprints = subparsers.add_parser( 'footprints', help='vectorised vs geopandas footprint builder' )
+    footprints.add_argument('--shots', type=int, help='number of shots', default=1000000 )
+
+    # grid cell aggregation
+    grid = subparsers.add_parser( 'grid', help='floor division binning vs sjoin + dissolve' )
+    grid.add_argument('--shots', type=int, help='number of shots', default=1000000 )
+    grid.add_argument('--cell_size', type=float, help='cell size in metres', default=1000 )
+
+    return parser.parse_args(args)
+
+
+# execute main
+if __name__ == '__main__':
+
+    # run selected benchmark on synthetic data
+    args = parseArguments()
+    if args.command == 'groupdata':
+        createGranule( args.pathname, args.shots, args.variables )
+        benchmarkGroupData( args.pathname, args.repeat )
+
+    if args.command == 'stats':
+        benchmarkStatsParser( args.files, args.bands, args.repeat )
+
+    if args.command == 'footprints':
+        benchmarkFootprints( args.shots, args.repeat )
+
+    if args.command == 'grid':
+        benchmarkGrid( args.shots, args.cell_size, args.repeat )
@@ -0,0 +1,190 @@
+import io
+import shapely
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+from sqlalchemy import inspect, Integer, Float
+from sqlalchemy.dialects.postgresql import ARRAY
+from geopandas.array import GeometryDtype
+
+
+class BulkWriter():
+
+    # constants
+    batch_size = 50000
+
+
+    def __init__( self, engine, name, schema=None, batch_size=None, staging=False ):
+
+        """
+        constructor
+        """
+
+        # target table + copy options
+        self._engine = engine
+        self._name = name
+        self._schema = schema
+
+        self._batch_size = batch_size if batch_size is not None else BulkWriter.batch_size
+        self._staging = staging
+        return
+
+
+    @classmethod
+    def fromConfig( cls, engine, name, schema, config ):
+
+        """
+        create writer from optional bulk section of database configuration
+        """
+
+        options = config.get( 'bulk' ) or {}
+        return cls( engine,
+                    name,
+                    schema=schema,
+                    batch_size=options.get( 'batch_size' ),
+                    staging=options.get( 'staging', False ) )
+
+
+    def write( self, df, index=True, index_label=None ):
+
+        """
+        stream dataframe into target table with copy from stdin
+        """
+
+        # move index into columns
+        if index:
+            df = df.reset_index( names=index_label ) if index_label is not None else df.reset_index()
+
+        # create target table from frame schema if required
+        self.createTable( df, dtype=self.getArrayTypes( df ) )
+
+        # serialise frame for copy
+        frame = self.getCopyFrame( df )
+        columns = ', '.join( self.quote( column ) for column in frame.columns )
+        target = self.getTableName()
+
+        connection = self._engine.raw_connection()
+        try:
+
+            cursor = connection.cursor()
+
+            # optionally copy into temporary staging table dropped on commit
+            dest = target
+            if self._staging:
+                dest = self.quote( f'{self._name}_staging' )
+                cursor.execute( f'CREATE TEMP TABLE {dest} ( LIKE {target} INCLUDING DEFAULTS ) ON COMMIT DROP' )
+
+            # copy frame in fixed size batches
+            for offset in range( 0, len( frame ), self._batch_size ):
+
+                buffer = io.StringIO()
+                frame.iloc[ offset : offset + self._batch_size ].to_csv( buffer, index=False, header=False )
+                buffer.seek( 0 )
+
+                cursor.copy_expert( f'COPY {dest} ( {columns} ) FROM STDIN WITH ( FORMAT csv )', buffer )
+
+                # without staging - commit each batch as it lands
+                if not self._staging:
+                    connection.commit()
+
+            # merge staging table into target in single transaction
+            if self._staging:
+                cursor.execute( f'INSERT INTO {target} ( {columns} ) SELECT {columns} FROM {dest}' )
+                connection.commit()
+
+        except BaseException:
+            connection.rollback()
+            raise
+
+        finally:
+            connection.close()
+
+        return len( frame )
+
+
+    def createTable( self, df, dtype=None ):
+
+        """
+        create empty target table with frame schema if not exists
+        """
+
+        if not inspect( self._engine ).has_table( self._name, schema=self._schema ):
+
+            if isinstance( df, gpd.GeoDataFrame ):
+                df.head( 0 ).to_postgis( self._name, self._engine, schema=self._schema, index=False, dtype=dtype )
+            else:
+                df.head( 0 ).to_sql( self._name, self._engine, schema=self._schema, index=False, dtype=dtype )
+
+        return
+
+
+    @staticmethod
+    def getArrayColumns( df ):
+
+        """
+        get object columns holding fixed width numpy arrays or lists
+        """
+
+        columns = {}
+        for column in df.columns:
+
+            if df[ column ].dtype == object:
+
+                values = df[ column ].dropna()
+                if len( values ) > 0 and isinstance( values.iloc[ 0 ], ( np.ndarray, list ) ):
+                    columns[ column ] = np.asarray( values.iloc[ 0 ] ).dtype
+
+        return columns
+
+
+    def getArrayTypes( self, df ):
+
+        """
+        postgresql array types for array columns
+        """
+
+        return { column : ARRAY( Integer if np.issubdtype( dtype, np.integer ) else Float ) for column, dtype in self.getArrayColumns( df ).items() }
+
+
+    def getCopyFrame( self, df ):
+
+        """
+        convert geometry columns to hex ewkb and array columns to array literals for copy
+        """
+
+        # plain dataframe - hex strings in geodataframe geometry column warn on every batch
+        frame = pd.DataFrame( df ).copy( deep=False )
+        for column in self.getArrayColumns( frame ):
+            frame[ column ] = [ '{' + ','.join( map( str, value ) ) + '}' if value is not None else None for value in frame[ column ] ]
+
+        for column in frame.columns:
+
+            if isinstance( frame[ column ].dtype, GeometryDtype ):
+
+                # embed srid so postgis geometry column accepts text input
+                geoms = frame[ column ].values
+                srid = geoms.crs.to_epsg() if geoms.crs is not None else 0
+                frame[ column ] = shapely.to_wkb( shapely.set_srid( np.asarray( geoms ), srid ), hex=True, include_srid=True )
+
+        return frame
+
+
+    def getTableName( self ):
+
+        """
+        schema qualified table name
+        """
+
+        name = self.quote( self._name )
+        return f'{self.quote( self._schema )}.{name}' if self._schema is not None else name
+
+
+    @staticmethod
+    def quote( identifier ):
+
+        """
+        quote sql identifier
+        """
+
+        return '"{}"'.format( identifier.replace( '"', '""' ) )
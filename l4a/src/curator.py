@@ -1,15 +1,22 @@
 import os
+import re
+import glob
 import json
+import asyncio
 import yaml
 import argparse
+import numpy as np
 import pandas as pd
 import geopandas as gpd
 
 from munch import munchify
-from datetime import datetime, timedelta
-from sqlalchemy import create_engine
+from datetime import timedelta
+from sqlalchemy import text
 
 from client import Client
+from storage import getEngine
+from orchestrator import Orchestrator
+from footprint import getFootprints, writeGeoDatabase
 
 
 def getRequestId( pathname ):
@@ -29,19 +36,52 @@ def getRequestId( pathname ):
     return request_id
 
 
-def getRequests( records, client, args ):
+def getChunks( records, chunk_size ):
 
+    # utm zone of each shot from longitude and hemisphere
+    lon, lat = records.geometry.x.values, records.geometry.y.values
+    zone = ( np.floor( ( lon + 180 ) / 6 ).astype( int ) % 60 ) + 1
+    epsg = np.where( lat >= 0, 32600, 32700 ) + zone
+
+    for code, group in records.groupby( epsg, sort=True ):
+
+        # order shots along hilbert curve so neighbouring shots share a chunk
+        group = group.iloc[ np.argsort( group.geometry.hilbert_distance().values, kind='stable' ) ]
+
+        # balanced chunk sizes no larger than target
+        count = -( -len( group ) // chunk_size )
+        size = -( -len( group ) // count )
+
+        for idx, offset in enumerate( range( 0, len( group ), size ) ):
+            yield int( code ), idx, group[ offset : offset + size ]
+
+
+def getLegacyRequestIds( date, out_path ):
+
+    # requests posted under previous <date>_<offset> folder layout
     request_ids = []
-    for offset in range ( 0, len( records ), args.chunk_size ):
+    for pathname in sorted( glob.glob( os.path.join( out_path, '{date}_*'.format( date=date.strftime('%Y%m%d') ), 'response.json' ) ) ):
+
+        if re.fullmatch( r'\d{8}_\d+', os.path.basename( os.path.dirname( pathname ) ) ):
+            request_id = getRequestId( pathname )
+            if request_id is not None:
+                request_ids.append( request_id )
+
+    return request_ids
+
+
+def getRequests( date, records, client, args ):
+
+    # date already processed under previous folder layout - reuse requests rather than post again
+    request_ids = getLegacyRequestIds( date, args.out_path )
+    if request_ids:
+        print ( 'Reusing {count} existing requests for {date}'.format( count=len( request_ids ), date=date.strftime('%Y-%m-%d') ) )
+        return request_ids
 
-        # process records in chunks - transform to local utm
-        subset = records[ offset : offset + args.chunk_size ].copy()
-        subset = subset.to_crs( subset.estimate_utm_crs() )
-        subset.geometry = subset.geometry.buffer( 30 )
+    for epsg, idx, subset in getChunks( records, args.chunk_size ):
 
         # create unique pathname to save geodatabase
-        date = pd.to_datetime( row.date ).strftime('%Y%m%d')
-        path = os.path.join( args.out_path, f'{date}_{offset}' )
+        path = os.path.join( args.out_path, '{date}_{epsg}_{idx}'.format( date=date.strftime('%Y%m%d'), epsg=epsg, idx=idx ) )
         
         # check if api request for record subset already created 
         request_id = getRequestId( os.path.join( path, 'response.json' ) )
@@ -49,12 +89,13 @@ def getRequests( records, client, args ):
 
             # save batch api compatible geodatabase file to disc
             pathname = os.path.join( path, 'polygons.gpkg' )
-            if ( getGeoDatabase( subset, pathname ) ):
+            if ( getGeoDatabase( subset, epsg, pathname ) ):
             
-                args.timeframe = { 'start' : row.date - delta, 'end' : row.date + delta }
+                delta = timedelta( hours=args.delta )
+                args.timeframe = { 'start' : date - delta, 'end' : date + delta }
                 
                 # aws related info
-                aws = munchify( { 'bucket' : args.bucket, 'prefix' : os.path.join( args.prefix, f'{date}_{offset}' ) } )
+                aws = munchify( { 'bucket' : args.bucket, 'prefix' : os.path.join( args.prefix, os.path.basename( path ) ) } )
                 aws.prefix = aws.prefix.replace(os.sep, '/' )
 
                 # post request
@@ -75,69 +116,59 @@ def getRequests( records, client, args ):
 
 
 
-def getGeoDatabase( subset, pathname ):
+def getGeoDatabase( subset, epsg, pathname ):
 
-    subset = subset [ [ 'shot_number', 'geometry' ] ]
-    geodb = subset.copy()
+    # 30m footprints in chunk utm zone - cached transformer + vectorised buffer
+    footprints = getFootprints( subset.geometry.x.values, subset.geometry.y.values, epsg )
 
-    # rename columns for batch api
-    geodb['id'] = geodb.reset_index().index
-    geodb = geodb.rename( columns={ 'shot_number': 'identifier' } )
-    geodb[ 'identifier'] = geodb[ 'identifier'].astype(str)
+    # write batch api compatible geodatabase file in single call
+    return writeGeoDatabase( subset[ 'shot_number' ].values, footprints, epsg, pathname )
 
-    # create folder if not exists
-    if not os.path.exists( os.path.dirname( pathname ) ):
-        os.makedirs( os.path.dirname( pathname ) )
 
-    # write to file as geodatabase 
-    geodb.to_file( pathname, driver='GPKG', index=False )
-    return os.path.exists( pathname )
+def getFilterCommand( config, where='' ):
 
+    # qualifying shots - thresholds supplied as bound parameters
+    return text( """ \
+              SELECT * FROM {schema}.{table} \
+                WHERE agbd >= :min_agbd AND agbd <= :max_agbd \
+                    AND landsat_treecover >= :min_treecover {where} \
+                """.format( schema=config.table.schema, 
+                            table=config.table.name,
+                            where=where ) )
 
-def getConnectionString( config ):
 
-    server = config.server
-    return 'postgresql://{user}:{password}@{host}:{port}/{database}'.format( user=server.user, 
-                                                                            password=server.password, 
-                                                                            host=server.host, 
-                                                                            port=server.port, 
-                                                                            database=server.database )
+def getFilterParams( args ):
 
+    return { 'min_agbd' : args.min_agbd, 'max_agbd' : args.max_agbd, 'min_treecover' : args.min_treecover }
 
-def getTimestamps( config ):
 
-    # set up database connection engine
-    command = "SELECT DISTINCT DATE (datetime ) FROM {schema}.{table}".format( schema=config.table.schema, 
-                                                                                table=config.table.name )
+def getRecordStream( config, engine, args, chunk_size=50000 ):
 
-    return pd.read_sql( command, create_engine( getConnectionString( config ) ) )
+    # single scan of qualifying shots ordered by date via server-side cursor
+    command = getFilterCommand( config, where='ORDER BY date' )
+    with engine.connect().execution_options( stream_results=True ) as connection:
 
+        chunks = gpd.read_postgis(  command, 
+                                    connection, 
+                                    geom_col='geometry', 
+                                    params=getFilterParams( args ), 
+                                    chunksize=chunk_size )
 
-def getRecords( config, date, args ):
+        # emit records one date at a time - trailing date held until complete
+        pending = None
+        for chunk in chunks:
 
-    # set up database connection engine
-    server = config.server
-    connection = 'postgresql://{user}:{password}@{host}:{port}/{database}'.format( user=server.user, 
-                                                                                    password=server.password, 
-                                                                                    host=server.host, 
-                                                                                    port=server.port, 
-                                                                                    database=server.database )
-    # create and execute command
-    command = """ \
-              SELECT * FROM {schema}.{table} \
-                WHERE DATE(datetime) = '{date}' \
-                    AND agbd >= {min_agbd} AND agbd <= {max_agbd} \
-                        AND landsat_treecover >= {min_treecover}
-                """ .format(    schema=config.table.schema, 
-                                table=config.table.name,
-                                date=date,
-                                min_agbd=args.min_agbd,
-                                max_agbd=args.max_agbd,
-                                min_treecover=args.min_treecover )
+            if pending is not None:
+                chunk = pd.concat( [ pending, chunk ], ignore_index=True )
+
+            last = chunk[ 'date' ].iloc[ -1 ]
+            for date, records in chunk[ chunk[ 'date' ] != last ].groupby( 'date', sort=False ):
+                yield pd.to_datetime( date ), records
 
-    return gpd.GeoDataFrame.from_postgis(   command, 
-                                            create_engine( connection ), 
-                                            geom_col='geometry' )
+            pending = chunk[ chunk[ 'date' ] == last ]
+
+        if pending is not None and len( pending ) > 0:
+            yield pd.to_datetime( pending[ 'date' ].iloc[ 0 ] ), pending
 
 
 def getClient( pathname ):
@@ -171,6 +202,9 @@ def parseArguments(args=None):
     parser.add_argument('--resolution', type=int, help='timeframe delta', default=10 )
     parser.add_argument('--interval', type=str, help='timeframe delta', default='P1D' )
 
+    parser.add_argument('--concurrency', type=int, help='max concurrent batch api calls', default=8 )
+    parser.add_argument('--state_file', type=str, help='sqlite request state file', default=None )
+
 
     return parser.parse_args(args)
 
@@ -188,44 +222,23 @@ if __name__ == '__main__':
     with open( os.path.join( cfg_path, 'database/config.yml' ), 'r' ) as f:
         config = munchify( yaml.safe_load( f ) )
 
-    # get gedi timestamps
-    timestamps = getTimestamps( config )
-    timestamps[ 'date' ] = pd.to_datetime( timestamps[ 'date'] )    
+    # pooled database engine shared by all queries
+    engine = getEngine( config )
 
     # get sentinel-hub client
     client = getClient( os.path.join( cfg_path, 'sentinelhub/config.yml' ) )
 
-    # iterate through unique timestamps
-    delta = timedelta(hours=args.delta)
-    for idx, row in timestamps.iterrows():
+    # stream qualifying records in single scan - grouped by date
+    request_ids = []
+    for date, records in getRecordStream( config, engine, args ):
 
         # get request ids - from file / server
-        request_ids = getRequests( getRecords( config, row.date, args ), client, args )
-        for request_id in request_ids:
-            
-            # get current status of api request
-            response = client.getStatus( request_id )
-
-            # request created -> analyze
-            if ( response[ 'status' ] == 'CREATED' ):
-
-                status_code = client.setAnalysis( request_id )
-                print( f'Set Analysis: {request_id} -> {status_code}' )
-
-            # analysis complete -> start
-            if ( response[ 'status' ] == 'ANALYSIS_DONE' ):
-
-                status_code = client.startRequest( request_id )
-                print( f'Start Request: {request_id} -> {status_code}' )
-
-            # processing request
-            if ( response[ 'status' ] == 'PROCESSING' ):
-                completionPercentage = response[ 'completionPercentage' ]
-                print( f'Processing Request: {request_id} - completed {completionPercentage}%' )
+        request_ids.extend( getRequests( date, records, client, args ) )
 
-            # processing completed
-            if ( response[ 'status' ] == 'DONE' ):
-                print( f'Request completed: {request_id}' )
+    # drive all batch requests to completion - state persisted across runs
+    os.makedirs( args.out_path, exist_ok=True )
+    state_file = args.state_file if args.state_file is not None else os.path.join( args.out_path, 'requests.sqlite' )
+    orchestrator = Orchestrator( client, state_file, concurrency=args.concurrency )
+    results = asyncio.run( orchestrator.run( request_ids ) )
 
-        if idx == 150:
-            break
+    print( 'requests: {total} - done: {done}'.format( total=len( results ), done=sum( status == 'DONE' for status in results.values() ) ) )
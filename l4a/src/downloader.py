@@ -1,8 +1,112 @@
 import os
+import json
+import shutil
+import hashlib
+import argparse
+import requests
+import threading
 import geopandas as gpd
 
 from gedil4a import GediL4a
 from shapely.ops import orient
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class GranuleCache():
+
+    # constants
+    block_size = 1024 * 1024
+
+
+    def __init__( self, path ):
+
+        """
+        constructor
+        """
+
+        # content addressed objects + url index + partial downloads
+        self._path = path
+        self._objects = os.path.join( path, 'objects' )
+        self._partial = os.path.join( path, 'partial' )
+        self._index_pathname = os.path.join( path, 'index.json' )
+
+        for folder in [ self._objects, self._partial ]:
+            os.makedirs( folder, exist_ok=True )
+
+        # load url -> checksum index
+        self._lock = threading.Lock()
+        self._index = {}
+        if os.path.exists( self._index_pathname ):
+            with open( self._index_pathname, 'r' ) as f:
+                self._index = json.load( f )
+
+        return
+
+
+    def getObjectPathname( self, checksum ):
+
+        """
+        pathname of cached object
+        """
+
+        return os.path.join( self._objects, checksum[ : 2 ], checksum )
+
+
+    def getPartialPathname( self, url ):
+
+        """
+        pathname of partial download keyed on url
+        """
+
+        return os.path.join( self._partial, hashlib.sha256( url.encode() ).hexdigest() + '.part' )
+
+
+    def lookup( self, url ):
+
+        """
+        get cached object pathname for url - None if not cached
+        """
+
+        checksum = self._index.get( url )
+        if checksum is not None:
+
+            pathname = self.getObjectPathname( checksum )
+            if os.path.exists( pathname ):
+                return pathname
+
+        return None
+
+
+    def add( self, url, pathname ):
+
+        """
+        move completed download into content addressed store
+        """
+
+        # hash content
+        sha256 = hashlib.sha256()
+        with open( pathname, 'rb' ) as f:
+            for block in iter( lambda: f.read( GranuleCache.block_size ), b'' ):
+                sha256.update( block )
+
+        checksum = sha256.hexdigest()
+        target = self.getObjectPathname( checksum )
+
+        # identical content under different url is stored once
+        os.makedirs( os.path.dirname( target ), exist_ok=True )
+        if os.path.exists( target ):
+            os.remove( pathname )
+        else:
+            os.replace( pathname, target )
+
+        # update index atomically
+        with self._lock:
+            self._index[ url ] = checksum
+            with open( self._index_pathname + '.tmp', 'w' ) as f:
+                json.dump( self._index, f, indent=4 )
+            os.replace( self._index_pathname + '.tmp', self._index_pathname )
+
+        return target
 
 
 def getAoi( path, names ):
@@ -24,6 +128,136 @@ def getAoi( path, names ):
     return counties
 
 
+def getContentSize( response ):
+
+    """
+    total file size from content-range or content-length header - None if unknown
+    """
+
+    # partial content or unsatisfiable range - bytes start-end/total or bytes */total
+    content_range = response.headers.get( 'Content-Range' )
+    if content_range is not None:
+        total = content_range.rsplit( '/', 1 )[ -1 ]
+        return int( total ) if total.isdigit() else None
+
+    # full content - length unreliable when transfer encoded
+    length = response.headers.get( 'Content-Length' )
+    if response.status_code == 200 and length is not None and length.isdigit() and 'Content-Encoding' not in response.headers:
+        return int( length )
+
+    return None
+
+
+def downloadGranule( url, size, cache, session, timeout=60 ):
+
+    """
+    download granule into cache - resuming partial file with http range request
+    """
+
+    # already cached
+    pathname = cache.lookup( url )
+    if pathname is not None:
+        return pathname, 'cached'
+
+    # resume from end of partial download
+    partial = cache.getPartialPathname( url )
+    offset = os.path.getsize( partial ) if os.path.exists( partial ) else 0
+
+    headers = { 'Range' : f'bytes={offset}-' } if offset > 0 else {}
+    with session.get( url, headers=headers, stream=True, timeout=timeout ) as response:
+
+        # total size of complete file reported by server
+        expected = getContentSize( response )
+
+        # range not satisfiable - partial file already complete
+        if response.status_code != 416:
+
+            response.raise_for_status()
+
+            # append on partial content - server ignoring range restarts from scratch
+            mode = 'ab' if response.status_code == 206 else 'wb'
+            with open( partial, mode ) as f:
+                for block in response.iter_content( chunk_size=GranuleCache.block_size ):
+                    f.write( block )
+
+    # check size against server response
+    actual = os.path.getsize( partial )
+    if expected is not None and actual != expected:
+
+        # truncated transfer kept for resume - oversized file corrupt so restart
+        if actual > expected:
+            os.remove( partial )
+
+        raise ValueError( f'size mismatch {url} : {actual} bytes - expected {expected}' )
+
+    # loose sanity check against catalogue size in mb - warning only
+    if size is not None and not any( abs( actual - size * unit ) <= 0.1 * size * unit for unit in [ 1000 * 1000, 1024 * 1024 ] ):
+        print ( f'warning: {url} : {actual} bytes differs from catalogue size {size} MB' )
+
+    return cache.add( url, partial ), 'downloaded'
+
+
+def downloadGranules( metadata, out_path, cache_path, workers=4, session=None ):
+
+    """
+    concurrently download granules listed in metadata geodataframe to out_path
+    """
+
+    # session reused across threads - earthdata credentials picked up from .netrc
+    if session is None:
+        session = requests.Session()
+
+    cache = GranuleCache( cache_path )
+    os.makedirs( out_path, exist_ok=True )
+
+    def fetch( url, size ):
+
+        # link cached object into output path under original name
+        pathname, status = downloadGranule( url, size, cache, session )
+        target = os.path.join( out_path, os.path.basename( url ) )
+        if not os.path.exists( target ):
+            try:
+                os.link( pathname, target )
+            except OSError:
+                shutil.copyfile( pathname, target )
+
+        return target, status
+
+    results = []
+    with ThreadPoolExecutor( max_workers=workers ) as pool:
+
+        futures = { pool.submit( fetch, row.url, row.size ) : row.url for row in metadata.itertuples() }
+        for future in as_completed( futures ):
+
+            try:
+                target, status = future.result()
+                print ( f'{status} : {target}' )
+                results.append( ( futures[ future ], target, status ) )
+
+            except Exception as err:
+                print ( 'Exception downloading {url} : {msg}'.format( url=futures[ future ], msg=str( err ) ) )
+                results.append( ( futures[ future ], None, 'failed' ) )
+
+    return results
+
+
+def parseArguments(args=None):
+
+    """
+    parse arguments
+    """
+
+    # parse command line arguments
+    parser = argparse.ArgumentParser(description='downloader')
+
+    # optional args
+    parser.add_argument('--out_path', type=str, help='download granules to path', default=None )
+    parser.add_argument('--cache_path', type=str, help='granule cache path', default='cache' )
+    parser.add_argument('--workers', type=int, help='concurrent downloads', default=4 )
+
+    return parser.parse_args(args)
+
+
 # execute main
 if __name__ == '__main__':
 
@@ -32,11 +266,16 @@ if __name__ == '__main__':
     root_path = os.getcwd()[ 0 : os.getcwd().find( repo ) + len ( repo )]
 
     # get area of interest dataframe
+    args = parseArguments()
     county_names = ['Kiambu', 'Laikipia', 'Nakuru', 'Nyandarua', 'Nyeri' ]
     aoi = getAoi( os.path.join( root_path, 'aois/kenya' ), county_names )
 
     # grab meta record of datasets collocated with aoi
-    metadata = GediL4a.getGranuleMetadata( aoi )            
+    metadata = GediL4a.getGranuleMetadata( aoi )
     print ( 'meta records: {}'.format( len( metadata ) ) )
 
     metadata.to_csv( 'granules.csv', columns = ['url'], index=False, header=False )
+
+    # optionally fetch granules
+    if args.out_path is not None:
+        downloadGranules( metadata, args.out_path, args.cache_path, workers=args.workers )
@@ -0,0 +1,193 @@
+import os
+import json
+import yaml
+import argparse
+import numpy as np
+import pandas as pd
+
+from munch import munchify
+
+from storage import getStore
+
+
+def getShots( store, name, target='agbd', columns=None, filters=None ):
+
+    """
+    columnar read of gedi shot attributes - no geometry decoded
+    """
+
+    names = list( dict.fromkeys( [ 'shot_number', 'datetime', target ] + list( columns or [] ) ) )
+    df = store.read( name, columns=names, filters=filters )
+
+    df[ 'shot_number' ] = df[ 'shot_number' ].astype( np.int64 )
+    df[ 'datetime' ] = pd.to_datetime( df[ 'datetime' ], utc=True )
+
+    return df
+
+
+def getStatistics( store, name, stats=( 'mean', 'stdev' ), shot_numbers=None ):
+
+    """
+    columnar read of sentinel statistic columns with selected stat suffixes
+    """
+
+    # select feature columns by stat suffix from table schema
+    features = [ column for column in store.getColumns( name ) if column.rsplit( '_', 1 )[ -1 ] in stats ]
+
+    filters = [ ( 'shot_number', 'in', shot_numbers ) ] if shot_numbers is not None else None
+    df = store.read( name, columns=[ 'shot_number', 'interval_from', 'interval_to' ] + features, filters=filters )
+
+    df[ 'shot_number' ] = df[ 'shot_number' ].astype( np.int64 )
+    df[ 'interval_from' ] = pd.to_datetime( df[ 'interval_from' ], utc=True )
+    df[ 'interval_to' ] = pd.to_datetime( df[ 'interval_to' ], utc=True )
+
+    return df, features
+
+
+def joinStatistics( shots, stats, features, tolerance='1D' ):
+
+    """
+    attach statistics of interval containing each shot acquisition
+    """
+
+    # as-of join by shot number on latest interval starting at or before shot - tolerance is interval length
+    merged = pd.merge_asof( shots.sort_values( 'datetime' ),
+                            stats.sort_values( 'interval_from' )[ [ 'shot_number', 'interval_from', 'interval_to' ] + features ],
+                            left_on='datetime',
+                            right_on='interval_from',
+                            by='shot_number',
+                            direction='backward',
+                            tolerance=pd.Timedelta( tolerance ) )
+
+    # reject matches where shot falls after interval end
+    outside = ( merged[ 'datetime' ] >= merged[ 'interval_to' ] ).to_numpy()
+    merged.loc[ outside, features ] = np.nan
+
+    return merged.drop( columns=[ 'interval_from', 'interval_to' ] )
+
+
+def buildFeatureMatrix( store, shot_table, stats_tables, out_path, target='agbd', columns=None, stats=( 'mean', 'stdev' ), tolerance='1D', filters=None, dropna=True ):
+
+    """
+    join gedi shots with sentinel statistics into float32 memory mapped feature matrix + target vector
+    """
+
+    df = getShots( store, shot_table, target=target, columns=columns, filters=filters ).dropna( subset=[ 'datetime' ] )
+    features = list( columns or [] )
+
+    for name in stats_tables:
+
+        # restrict statistic reads to shots passing filters
+        shot_numbers = df[ 'shot_number' ].tolist() if filters is not None else None
+        values, names = getStatistics( store, name, stats=stats, shot_numbers=shot_numbers )
+
+        # prefix feature names shared between tables
+        renamed = { column : f'{name}_{column}' for column in names if column in df.columns }
+        values = values.rename( columns=renamed )
+        names = [ renamed.get( column, column ) for column in names ]
+
+        df = joinStatistics( df, values, names, tolerance=tolerance )
+        features.extend( names )
+
+    # acquisition day of year
+    df[ 'doy' ] = df[ 'datetime' ].dt.dayofyear
+    features.append( 'doy' )
+
+    # drop shots with incomplete features or target
+    if dropna:
+        df = df.dropna( subset=features + [ target ] )
+
+    return writeFeatureMatrix( df, features, target, out_path )
+
+
+def writeFeatureMatrix( df, features, target, out_path ):
+
+    """
+    write contiguous float32 npy arrays loadable with mmap_mode
+    """
+
+    os.makedirs( out_path, exist_ok=True )
+    n = len( df )
+
+    # row major matrix filled column by column - no intermediate float64 copy
+    matrix = np.lib.format.open_memmap( os.path.join( out_path, 'features.npy' ), mode='w+', dtype=np.float32, shape=( n, len( features ) ) )
+    for idx, name in enumerate( features ):
+        matrix[ :, idx ] = df[ name ].to_numpy( dtype=np.float32 )
+    matrix.flush()
+
+    vector = np.lib.format.open_memmap( os.path.join( out_path, 'target.npy' ), mode='w+', dtype=np.float32, shape=( n, ) )
+    vector[ : ] = df[ target ].to_numpy( dtype=np.float32 )
+    vector.flush()
+
+    np.save( os.path.join( out_path, 'shot_number.npy' ), df[ 'shot_number' ].to_numpy( dtype=np.int64 ) )
+
+    # column layout
+    metadata = { 'features' : features, 'target' : target, 'rows' : n }
+    with open( os.path.join( out_path, 'metadata.json' ), 'w' ) as f:
+        json.dump( metadata, f, indent=4 )
+
+    return metadata
+
+
+def loadFeatureMatrix( out_path ):
+
+    """
+    memory mapped feature matrix, target vector and column layout
+    """
+
+    with open( os.path.join( out_path, 'metadata.json' ), 'r' ) as f:
+        metadata = json.load( f )
+
+    matrix = np.load( os.path.join( out_path, 'features.npy' ), mmap_mode='r' )
+    vector = np.load( os.path.join( out_path, 'target.npy' ), mmap_mode='r' )
+
+    return matrix, vector, metadata
+
+
+def parseArguments(args=None):
+
+    """
+    parse arguments
+    """
+
+    # parse command line arguments
+    parser = argparse.ArgumentParser(description='features')
+
+    # mandatory args
+    parser.add_argument('db_file', action='store', help='yaml database configuration file' )
+    parser.add_argument('out_path', action='store', help='feature matrix output path' )
+    parser.add_argument('stats_tables', action='store', nargs='+', help='sentinel statistic tables' )
+
+    # optional args
+    parser.add_argument('--target', type=str, help='target column', default='agbd' )
+    parser.add_argument('--columns', type=str, nargs='*', help='additional gedi feature columns', default=[ 'solar_elevation', 'landsat_treecover' ] )
+    parser.add_argument('--stats', type=str, nargs='*', help='statistic suffixes selected as features', default=[ 'mean', 'stdev' ] )
+    parser.add_argument('--tolerance', type=str, help='statistical api interval length', default='1D' )
+    parser.add_argument('--max_target', type=float, help='exclude target values above', default=None )
+
+    return parser.parse_args(args)
+
+
+# execute main
+if __name__ == '__main__':
+
+    # load config parameters from file
+    args = parseArguments()
+    with open( args.db_file, 'r' ) as f:
+        config = munchify( yaml.safe_load( f ) )
+
+    # set up storage backend - postgis or geoparquet
+    store = getStore( config )
+
+    filters = [ ( args.target, '<', args.max_target ) ] if args.max_target is not None else None
+    metadata = buildFeatureMatrix(  store,
+                                    config.table.name,
+                                    args.stats_tables,
+                                    args.out_path,
+                                    target=args.target,
+                                    columns=args.columns,
+                                    stats=args.stats,
+                                    tolerance=args.tolerance,
+                                    filters=filters )
+
+    print ( 'feature matrix : {rows} rows x {n} features'.format( rows=metadata[ 'rows' ], n=len( metadata[ 'features' ] ) ) )
@@ -0,0 +1,60 @@
+import os
+import shapely
+import numpy as np
+import geopandas as gpd
+
+from functools import lru_cache
+from pyproj import Transformer
+
+# optional fast vector writer
+try:
+    import pyogrio
+except ImportError:
+    pyogrio = None
+
+
+@lru_cache( maxsize=None )
+def getTransformer( epsg ):
+
+    """
+    cached geographic to utm transformer per zone
+    """
+
+    return Transformer.from_crs( 4326, epsg, always_xy=True )
+
+
+def getFootprints( lon, lat, epsg, radius=30, quad_segs=2 ):
+
+    """
+    vectorised footprint polygons around shot locations in utm coordinates
+    """
+
+    # project coordinate arrays in one call
+    x, y = getTransformer( epsg ).transform( np.asarray( lon ), np.asarray( lat ) )
+
+    # low segment count buffer - shot footprint approximated by polygon
+    return shapely.buffer( shapely.points( x, y ), radius, quad_segs=quad_segs )
+
+
+def writeGeoDatabase( identifiers, footprints, epsg, pathname ):
+
+    """
+    write batch api compatible geodatabase in single bulk call
+    """
+
+    # batch api column layout
+    geodb = gpd.GeoDataFrame( { 'id' : np.arange( len( footprints ) ),
+                                'identifier' : np.asarray( identifiers ).astype( str ) },
+                                geometry=footprints,
+                                crs=epsg )
+
+    # create folder if not exists
+    os.makedirs( os.path.dirname( pathname ), exist_ok=True )
+
+    # write to file as geodatabase
+    if pyogrio is not None:
+        pyogrio.write_dataframe( geodb, pathname, driver='GPKG' )
+    else:
+        geodb.to_file( pathname, driver='GPKG', index=False )
+
+    return os.path.exists( pathname )
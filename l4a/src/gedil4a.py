@@ -1,14 +1,17 @@
 import os
-import re
+import json
+import time
+import hashlib
+import operator
 import h5py
+import shapely
 import requests
 import numpy as np
 import pandas as pd
 import geopandas as gpd
 
 from datetime import datetime
-from shapely.geometry import Polygon
-from shapely.geometry import MultiPolygon
+from concurrent.futures import ThreadPoolExecutor
 
 
 class GediL4a():
@@ -18,6 +21,29 @@ class GediL4a():
     base_url = 'https://cmr.earthdata.nasa.gov/search/'
     page_size = 2000
 
+    # memoised collection concept id - ( id, timestamp )
+    concept_id_ttl = 24 * 60 * 60
+    _concept_id = None
+
+    # default filters applied to beam data - ( dataset, operator, value )
+    qa_filters = [  ( 'agbd', '!=', -9999 ),
+                    ( 'algorithm_run_flag', '>', 0 ),
+                    ( 'l2_quality_flag', '==', 1 ),
+                    ( 'l4_quality_flag', '==', 1 ) ]
+
+    qa_columns = [ 'algorithm_run_flag', 'l2_quality_flag', 'l4_quality_flag' ]
+    required_columns = [ 'shot_number', 'delta_time', 'lat_lowestmode', 'lon_lowestmode' ]
+
+    # approximate in-memory size of shapely point for chunk sizing
+    geometry_bytes = 100
+
+    operators = {   '==' : operator.eq,
+                    '!=' : operator.ne,
+                    '>' : operator.gt,
+                    '>=' : operator.ge,
+                    '<' : operator.lt,
+                    '<=' : operator.le }
+
 
     def __init__( self, pathname ):
 
@@ -33,54 +59,238 @@ class GediL4a():
         return
 
 
-    def getBeamData( self, aoi=None ):
+    def getBeamData( self, aoi=None, columns=None, filters=None, ranges=None ):
 
         """
         getBeamData
         """
 
-        # empty dataframe
-        df = pd.DataFrame()
+        # read all beams as single chunk
+        chunks = list( self.iterBeamData( aoi=aoi, columns=columns, filters=filters, ranges=ranges ) )
+        if not chunks:
+            return gpd.GeoDataFrame( geometry=[], crs='EPSG:4326' )
 
-        # scan through keys
+        return chunks[ 0 ]
+
+
+    def iterBeamData( self, aoi=None, columns=None, filters=None, chunk_size=None, memory_budget=None, ranges=None ):
+
+        """
+        iterBeamData
+        """
+
+        # default to basic qa filtering
+        if filters is None:
+            filters = self.qa_filters
+
+        # chunks bounded by row count or memory budget
+        bounded = chunk_size is not None or memory_budget is not None
+        buffer, rows, size = [], 0, chunk_size
+
+        # scan through keys - restricted to indexed beams where ranges supplied
         for key in list( self._hf.keys()):
-            if key.startswith( 'BEAM' ):
+            if key.startswith( 'BEAM' ) and ( ranges is None or key in ranges ):
 
-                # get beam group
+                # get beam group incorporating land cover data
                 group = self._hf.get( key )
-                beam = self.getGroupData( group )
+                datasets = self.getDatasets( group )
+                names = self.getColumns( datasets, columns )
+
+                # convert memory budget into row count
+                if memory_budget is not None:
+                    size = self.getChunkSize( datasets, names, memory_budget )
+
+                # read beam or indexed shot ranges in shot index slices
+                n = datasets[ 'shot_number' ][ 0 ].shape[ 0 ]
+                step = size if bounded else max( n, 1 )
+
+                for start, stop in self.getSlices( ranges[ key ] if ranges is not None else [ ( 0, n ) ], n, step ):
+
+                    # evaluate filters on flag datasets before reading selected columns
+                    mask = self.getFilterMask( datasets, filters, aoi=aoi, start=start, stop=stop )
+                    if mask.any():
 
-                # merge in land cover data
-                beam = pd.merge( beam, 
-                                self.getGroupData( group[ 'land_cover_data'] ), 
-                                how='inner', 
-                                on='shot_number' )
+                        beam = self.readColumns( datasets, names, mask, offset=start )
+                        buffer.append( beam )
+                        rows += len( beam )
 
-                # reject null retrievals
-                beam = beam.replace( -9999, np.nan )    
-                beam = beam[ beam[ 'agbd' ].notna() ]
+                    # yield chunks of bounded size as soon as available
+                    while bounded and rows >= size:
 
-                # apply basic qa filtering
-                beam = beam[ beam[ 'algorithm_run_flag' ] > 0 ]
-                beam = beam[( beam[ 'l2_quality_flag' ] == 1) & ( beam[ 'l4_quality_flag' ] == 1 ) ]
+                        df = pd.concat( buffer, ignore_index=True )
+                        yield self.getGeoDataFrame( df.iloc[ : size ] )
 
-                # create datetime column
-                beam[ 'datetime' ] = self._base_time + pd.to_timedelta( beam.delta_time, unit='s' )
+                        buffer = [ df.iloc[ size : ] ]
+                        rows = len( buffer[ 0 ] )
 
-                # drop superfluous columns
-                beam = beam.drop( [ 'algorithm_run_flag', 'l2_quality_flag', 'l4_quality_flag' ], axis=1 )
-                df = pd.concat( [ x for x in [ df, beam ] if not x.empty ], ignore_index=True )
+        # yield remainder
+        if rows > 0:
+            yield self.getGeoDataFrame( pd.concat( buffer, ignore_index=True ) )
+
+
+    @staticmethod
+    def getSlices( ranges, n, step ):
+
+        """
+        getSlices
+        """
+
+        # split ( start, stop ) shot ranges into slices of at most step rows
+        for lo, hi in ranges:
+            hi = min( hi, n )
+            for start in range( lo, hi, step ):
+                yield start, min( start + step, hi )
+
+
+    def getGeoDataFrame( self, df ):
+
+        """
+        getGeoDataFrame
+        """
+
+        # reject null retrievals
+        df = df.replace( -9999, np.nan )    
+
+        # create datetime column
+        df[ 'datetime' ] = self._base_time + pd.to_timedelta( df.delta_time, unit='s' )
 
         # convert to a geopandas dataframe
         gdf = gpd.GeoDataFrame( df, geometry=gpd.points_from_xy( df.lon_lowestmode, df.lat_lowestmode ) )
         gdf = gdf.drop( [ 'lon_lowestmode', 'lat_lowestmode' ], axis=1 )
         gdf = gdf.set_crs( 'EPSG:4326' )
 
-        # filter on aoi
+        return gdf
+
+
+    def getChunkSize( self, datasets, names, memory_budget ):
+
+        """
+        getChunkSize
+        """
+
+        # bytes per row for selected columns plus datetime and point geometry
+        row_bytes = sum( datasets[ name ][ 0 ].dtype.itemsize for name in names )
+        row_bytes += 8 + self.geometry_bytes
+
+        return max( int( memory_budget // row_bytes ), 1 )
+
+
+    def getDatasets( self, group ):
+
+        """
+        getDatasets
+        """
+
+        # map column names to ( dataset, column index ) - beam group then land cover data
+        datasets = {}
+        for parent in [ group, group.get( 'land_cover_data' ) ]:
+
+            if parent is None:
+                continue
+
+            for key, value in parent.items():
+                if isinstance( value, h5py.Group ) or key in datasets:
+                    continue
+
+                # 1d vars
+                if ( value.ndim == 1 ):
+                    datasets[ key ] = ( value, None )
+                else:
+                    # handling for 2d covariance matrices
+                    if ( value.ndim == 2 ):
+                        for idx in range( value.shape[1] ):
+                            datasets[ key + '_' + str( idx + 1 ) ] = ( value, idx )
+
+        return datasets
+
+
+    def getColumns( self, datasets, columns=None ):
+
+        """
+        getColumns
+        """
+
+        # default to all columns excluding qa flags
+        if columns is None:
+            columns = [ name for name in datasets if name not in self.qa_columns ]
+
+        # prepend columns required for geometry + datetime
+        return list( dict.fromkeys( self.required_columns + list( columns ) ) )
+
+
+    def getFilterMask( self, datasets, filters, aoi=None, start=0, stop=None ):
+
+        """
+        getFilterMask
+        """
+
+        # all rows in shot index slice pass by default
+        dataset, idx = datasets[ 'shot_number' ]
+        stop = dataset.shape[ 0 ] if stop is None else min( stop, dataset.shape[ 0 ] )
+        mask = np.ones( stop - start, dtype=bool )
+
+        # read filter datasets only and combine conditions
+        for name, op, value in filters:
+
+            dataset, idx = datasets[ name ]
+            array = dataset[ start : stop ] if idx is None else dataset[ start : stop, idx ]
+            mask &= self.operators[ op ]( array[ : len( mask ) ], value )
+
+        # staged spatial filter on coordinates of remaining rows
         if aoi is not None:
-            gdf = gdf[ gdf['geometry'].within( aoi ) ]
 
-        return gdf
+            rows = np.flatnonzero( mask )
+            lon = datasets[ 'lon_lowestmode' ][ 0 ][ start : stop ][ rows ]
+            lat = datasets[ 'lat_lowestmode' ][ 0 ][ start : stop ][ rows ]
+            mask[ rows ] = self.getAoiMask( lon, lat, aoi )
+
+        return mask
+
+
+    @staticmethod
+    def getAoiMask( lon, lat, aoi ):
+
+        """
+        getAoiMask
+        """
+
+        # vectorised bounding box test on raw coordinates
+        xmin, ymin, xmax, ymax = aoi.bounds
+        mask = ( lon >= xmin ) & ( lon <= xmax ) & ( lat >= ymin ) & ( lat <= ymax )
+
+        # prepared geometry test on bounding box survivors only
+        rows = np.flatnonzero( mask )
+        if len( rows ):
+            shapely.prepare( aoi )
+            mask[ rows ] = shapely.contains_xy( aoi, lon[ rows ], lat[ rows ] )
+
+        return mask
+
+
+    def readColumns( self, datasets, names, mask, offset=0 ):
+
+        """
+        readColumns
+        """
+
+        # restrict hdf5 reads to slice spanning rows passing filters
+        rows = np.flatnonzero( mask )
+        lo, hi = ( rows[ 0 ], rows[ -1 ] + 1 ) if len( rows ) else ( 0, 0 )
+        mask = mask[ lo : hi ]
+        lo, hi = lo + offset, hi + offset
+
+        # read each dataset once - 2d datasets shared between columns
+        data, cache = {}, {}
+        for name in names:
+
+            dataset, idx = datasets[ name ]
+            if dataset.name not in cache:
+                cache[ dataset.name ] = dataset[ lo : hi ][ mask ]
+
+            array = cache[ dataset.name ]
+            data[ name ] = array if idx is None else array[ :, idx ]
+
+        return pd.DataFrame( data, copy=False )
 
 
     def getGroupData( self, group ):
@@ -89,37 +299,42 @@ class GediL4a():
         getGroupData
         """
 
-        # iterate through values
-        names, values = [], []
+        # iterate through values - build columns straight from numpy arrays
+        data = {}
         for key, value in group.items():
                     
             if not isinstance( value, h5py.Group ):
                 
-                # 1d vars
-                if ( len(value.shape) == 1 ):
-                    names.append( key )
-                    values.append( value[:].tolist() )
+                # 1d vars - read with native hdf5 dtype
+                if ( value.ndim == 1 ):
+                    data[ key ] = value[()]
                 else:
-                    # handling for 2d covariance matrices
-                    if ( len(value.shape) == 2 ):
-                        for idx in range( value.shape[1] ):
-                            names.append( key + '_' + str( idx + 1 ) )
-                            values.append( value[:, idx].tolist() )
+                    # handling for 2d covariance matrices - split into column views
+                    if ( value.ndim == 2 ):
+                        array = value[()]
+                        for idx in range( array.shape[1] ):
+                            data[ key + '_' + str( idx + 1 ) ] = array[ :, idx ]
                     else:
                         # ignore 3d params for now
                         continue
 
-        return pd.DataFrame( map(list, zip(*values)), columns=names )
+        # truncate to shortest dataset - consistent with row-wise zip
+        if data:
+            n = min( len( array ) for array in data.values() )
+            data = { key : array[ : n ] for key, array in data.items() }
+
+        return pd.DataFrame( data, copy=False )
 
 
-    def getGeolocationData( self, aoi=None ):
+    def getGeolocationData( self, aoi=None, geometry=True, shot_index=False ):
 
         """
         getGeolocationData
         """
 
-        # intermediate lists
-        lat_l, lon_l, time_l, beam_n, shot_l = [], [], [], [], []
+        # per beam arrays concatenated once
+        arrays = { 'shot_number' : [], 'beam' : [], 'lon' : [], 'lat' : [], 'delta_time' : [] }
+        beams = []
 
         # scan through keys
         for key in list( self._hf.keys()):
@@ -129,120 +344,158 @@ class GediL4a():
                 beam = self._hf.get( key )
 
                 # retrieve coords and times
-                lat = beam.get('lat_lowestmode')[:]
-                lon = beam.get('lon_lowestmode')[:]
-                time = beam.get('delta_time')[:] 
-                shot = beam.get('shot_number')[:] 
-
-                # add to current list
-                lat_l.extend(lat.tolist())
-                lon_l.extend(lon.tolist())
-                time_l.extend(time.tolist()) 
-                shot_l.extend(shot.tolist()) 
-
-                # number of shots in the beam group
-                n = lat.shape[0] 
-                beam_n.extend( np.repeat( str(key), n).tolist() )
-            
-        # create dataframe with datetime column
-        df = pd.DataFrame( list(zip(shot_l,beam_n,lat_l,lon_l,time_l) ), columns=['shot_number', 'beam', 'lat', 'lon', 'delta_time' ] )
-        df[ 'datetime' ] = self._base_time + pd.to_timedelta( df.delta_time, unit='s' )
-        df[ 'datetime' ] = df[ 'datetime' ].tz_localize('UTC')
+                values = {  'shot_number' : beam.get('shot_number')[()],
+                            'lon' : beam.get('lon_lowestmode')[()],
+                            'lat' : beam.get('lat_lowestmode')[()],
+                            'delta_time' : beam.get('delta_time')[()] }
+
+                # optional row position of shot within beam datasets
+                if shot_index:
+                    values[ 'shot_index' ] = np.arange( len( values[ 'shot_number' ] ), dtype=np.int64 )
+
+                # filter on aoi before building geometries
+                if aoi is not None:
+                    mask = self.getAoiMask( values[ 'lon' ], values[ 'lat' ], aoi )
+                    values = { name : array[ mask ] for name, array in values.items() }
+
+                # beam stored as small int code into beam names
+                values[ 'beam' ] = np.full( len( values[ 'shot_number' ] ), len( beams ), dtype=np.int8 )
+                beams.append( str( key ) )
+
+                for name, array in values.items():
+                    arrays.setdefault( name, [] ).append( array )
+
+        # single concatenation per column
+        data = { name : np.concatenate( values ) if values else np.empty( 0 ) for name, values in arrays.items() }
+
+        # turn fill values (-9999) to nan - float columns only
+        for name in [ 'lon', 'lat', 'delta_time' ]:
+            data[ name ] = np.where( data[ name ] == -9999, np.nan, data[ name ] )
+
+        # create dataframe with categorical beam and utc datetime column
+        df = pd.DataFrame( {    'shot_number' : data[ 'shot_number' ],
+                                'beam' : pd.Categorical.from_codes( data[ 'beam' ].astype( np.int8 ), categories=beams ) } )
+        if shot_index:
+            df[ 'shot_index' ] = data[ 'shot_index' ] if 'shot_index' in data else np.empty( 0, dtype=np.int64 )
+        df[ 'datetime' ] = ( self._base_time + pd.to_timedelta( data[ 'delta_time' ], unit='s' ) ).tz_localize('UTC')
+
+        # coordinates only - no geometry objects for catalogue indexing
+        if not geometry:
+            df[ 'lon' ] = data[ 'lon' ]
+            df[ 'lat' ] = data[ 'lat' ]
+            return df
 
         # convert to geodataframe registered to geographic crs
-        gdf = gpd.GeoDataFrame(  df, geometry=gpd.points_from_xy( df.lon, df.lat ) )
-        gdf.set_crs( 'EPSG:4326' )
+        return gpd.GeoDataFrame( df, geometry=gpd.points_from_xy( data[ 'lon' ], data[ 'lat' ] ), crs='EPSG:4326' )
 
-        # turn fill values (-9999) to nan
-        gdf = gdf.drop( [ 'lat', 'lon', 'delta_time' ], axis=1 )
-        gdf = gdf.replace( -9999, np.nan )    
 
-        # filter on aoi
-        if aoi is not None:
-            gdf = gdf[ gdf['geometry'].within( aoi ) ]
+    @staticmethod
+    def getCollectionConceptId():
 
-        return gdf
+        """
+        getCollectionConceptId
+        """
+
+        # memoised catalogue lookup - refreshed after ttl expires
+        now = time.time()
+        if GediL4a._concept_id is None or now - GediL4a._concept_id[ 1 ] > GediL4a.concept_id_ttl:
+
+            # retrieve metadata catalogue
+            doisearch = GediL4a.base_url + f'collections.json?doi={GediL4a.doi}'
+            GediL4a._concept_id = ( requests.get(doisearch).json()['feed']['entry'][0]['id'], now )
+
+        return GediL4a._concept_id[ 0 ]
 
 
     @staticmethod
-    def getGranuleMetadata( aoi ):
+    def getGranuleMetadata( aoi, start=None, end=None, cache_path=None, workers=4 ):
 
         """
         getGranuleMetadata
         """
 
-        def getCollectionConceptId():
+        # define search parameters - collection concept id resolved on cache miss only
+        data = {
+            "page_size": GediL4a.page_size,
+            "simplify-shapefile": 'true' # required to bypass 5000 coordinates limit of CMR
+        }
 
-            """
-            getCollectionConceptId
-            """
+        # optional acquisition time range
+        if start is not None or end is not None:
+            data[ 'temporal' ] = '{},{}'.format( pd.Timestamp( start ).strftime( '%Y-%m-%dT%H:%M:%SZ' ) if start is not None else '',
+                                                 pd.Timestamp( end ).strftime( '%Y-%m-%dT%H:%M:%SZ' ) if end is not None else '' )
 
-            # retrieve metadata catalogue
-            doisearch = GediL4a.base_url + f'collections.json?doi={GediL4a.doi}'
-            return requests.get(doisearch).json()['feed']['entry'][0]['id']
+        shapefile = aoi.geometry.to_json()
 
-        # initialise vars
-        metadata = list()    
-        page_num = 1
+        # load cached search response keyed on aoi geometry + time range
+        granules = None
+        if cache_path is not None:
+
+            key = hashlib.sha256( json.dumps( [ GediL4a.doi, shapefile, data ], sort_keys=True ).encode() ).hexdigest()
+            pathname = os.path.join( cache_path, f'cmr_{key}.json' )
+
+            if os.path.exists( pathname ):
+                with open( pathname, 'r' ) as f:
+                    granules = json.load( f )
+
+        if granules is None:
+
+            data[ 'collection_concept_id' ] = GediL4a.getCollectionConceptId()
+
+            def getPage( page_num ):
+
+                # execute post search        
+                payload = { "shapefile": ( "search.json", shapefile, "application/geo+json" ) }
+                search = GediL4a.base_url + 'granules.json'
+                response = requests.post( search, data=dict( data, page_num=page_num ), files=payload)
+                response.raise_for_status()
+
+                hits = response.headers.get( 'CMR-Hits' )
+                return response.json()['feed']['entry'], int( hits ) if hits is not None else None
+
+            # first page gives total hit count
+            granules, hits = getPage( 1 )
+            if hits is not None:
+
+                # fetch remaining pages in parallel - map preserves page order
+                pages = -( -hits // GediL4a.page_size )
+                if pages > 1:
+                    with ThreadPoolExecutor( max_workers=workers ) as pool:
+                        for entries, _ in pool.map( getPage, range( 2, pages + 1 ) ):
+                            granules.extend( entries )
+
+            else:
+
+                # hit count header missing - page sequentially until short or empty page
+                page_num, entries = 1, granules
+                while len( entries ) == GediL4a.page_size:
+                    page_num += 1
+                    entries, _ = getPage( page_num )
+                    granules.extend( entries )
+
+            # retain fields required for metadata in cache
+            granules = [ { name : g[ name ] for name in [ 'granule_size', 'polygons', 'links' ] if name in g } for g in granules ]
+            if cache_path is not None:
+
+                os.makedirs( cache_path, exist_ok=True )
+                with open( pathname, 'w' ) as f:
+                    json.dump( granules, f )
+
+        # parse catalogue polygons in bulk
+        metadata = { 'url' : [], 'geometry' : GediL4a.getGranulePolygons( granules ), 'size' : [] }
+        for g in granules:
+
+            # get dataset url
+            url = ''
+            for links in g['links']:
+                if 'title' in links and links['title'].startswith('Download') and links['title'].endswith('.h5'):
+                    url = links['href']
+
+            metadata[ 'url' ].append( url )
+            metadata[ 'size' ].append( float( g['granule_size'] ) )
 
-        # loop until break
-        while True:
-        
-            # define search and payload parameters
-            data = {
-                "collection_concept_id": getCollectionConceptId(), 
-                "page_size": GediL4a.page_size,
-                "page_num": page_num,
-                "simplify-shapefile": 'true' # required to bypass 5000 coordinates limit of CMR
-            }
-
-            payload = { "shapefile": ( "search.json", aoi.geometry.to_json(), "application/geo+json" ) }
-
-            # execute post search        
-            search = GediL4a.base_url + 'granules.json'
-            response = requests.post( search, data=data, files=payload)
-            granules = response.json()['feed']['entry']
-        
-            # granules in response ?
-            if granules:
-                
-                # iterate through granules
-                for g in granules:
-                                    
-                    # capture info in dictionary
-                    info = { 'url' : '', 'geometry' : '', 'size' : float( g['granule_size'] ) }
-                    if 'polygons' in g:
-
-                        # split multifeature list into separate objects
-                        polygons = []
-                        for polygon in g['polygons']:
-                            i=iter(polygon[0].split(" "))
-
-                            # append to list
-                            ltln = list(map(" ".join,zip(i,i)))
-                            polygons.append(Polygon([[float(p.split(" ")[1]), float(p.split(" ")[0])] for p in ltln]))
-
-                        # combine polygons into single object
-                        info[ 'geometry' ] = MultiPolygon( polygons )
-
-                    # get dataset url
-                    for links in g['links']:
-                        if 'title' in links and links['title'].startswith('Download') and links['title'].endswith('.h5'):
-                            info[ 'url' ] = links['href']
-
-                    # add to list        
-                    metadata.append( info )
-                
-                # next page
-                page_num += 1
-            
-            else: 
-                # end of granule search
-                break
-            
         # construct metadata geodataframe registered to geographic crs
-        gdf = gpd.GeoDataFrame( metadata )
-        gdf = gdf.set_crs( "EPSG:4326" )
+        gdf = gpd.GeoDataFrame( metadata, geometry='geometry', crs="EPSG:4326" )
 
         # drop duplicates + fix urls
         gdf = gdf.drop_duplicates( subset=['url'] )
@@ -252,25 +505,46 @@ class GediL4a():
         gdf[ 'acqtime' ] = GediL4a.getAcquisitionTimes( list( gdf[ 'url' ].values ) )
         return gdf
 
+
     @staticmethod
-    def getAcquisitionTimes( pathnames ):
+    def getGranulePolygons( granules ):
 
-        acq_times = []
+        """
+        getGranulePolygons
+        """
 
-        # convert to list if required
-        if not isinstance( pathnames, list ):
-            pathnames = [ pathnames ]
+        # collect outer ring strings with owning granule index
+        rings, owners = [], []
+        for idx, g in enumerate( granules ):
+            for polygon in g.get( 'polygons', [] ):
+                rings.append( polygon[ 0 ].strip() )
+                owners.append( idx )
 
-        # for each pathname / url
-        for pathname in pathnames:
+        geometry = np.full( len( granules ), None, dtype=object )
+        if rings:
 
-            # extract 13 digit delimited by underscores
-            m = re.search( '_[0-9]{13}_', os.path.basename( pathname ) )
-            dt = str( m.group(0) )
+            # parse all coordinate strings in one pass - cmr order is lat lon
+            coords = np.fromstring( ' '.join( rings ), sep=' ' ).reshape( -1, 2 )[ :, ::-1 ]
+            points = np.array( [ ring.count( ' ' ) + 1 for ring in rings ] ) // 2
 
-            # convert year / julian date to datetime
-            dt = re.sub('[^0-9]','', dt)
-            acq_times.append( datetime.strptime( dt, '%Y%j%H%M%S') )
+            # build rings, polygons and multipolygons with vectorised constructors
+            polygons = shapely.polygons( shapely.linearrings( coords, indices=np.repeat( np.arange( len( rings ) ), points ) ) )
+            owners, index = np.unique( owners, return_inverse=True )
+            geometry[ owners ] = shapely.multipolygons( polygons, indices=index )
+
+        return geometry
+
+
+    @staticmethod
+    def getAcquisitionTimes( pathnames ):
+
+        # convert to list if required
+        if not isinstance( pathnames, list ):
+            pathnames = [ pathnames ]
 
-        return acq_times
+        # extract 13 digits delimited by underscores from basename of each pathname / url
+        names = pd.Series( pathnames, dtype=str ).str.replace( '\\', '/', regex=False ).str.rsplit( '/', n=1 ).str[ -1 ]
+        digits = names.str.extract( '_([0-9]{13})_', expand=False )
 
+        # convert year / julian date to datetime
+        return pd.to_datetime( digits, format='%Y%j%H%M%S' ).tolist()
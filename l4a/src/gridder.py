@@ -0,0 +1,113 @@
+import shapely
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+
+def getCellIndices( x, y, cell_size, origin=( 0.0, 0.0 ) ):
+
+    """
+    integer grid cell column / row of projected coordinates
+    """
+
+    ix = np.floor_divide( np.asarray( x, dtype=np.float64 ) - origin[ 0 ], cell_size ).astype( np.int64 )
+    iy = np.floor_divide( np.asarray( y, dtype=np.float64 ) - origin[ 1 ], cell_size ).astype( np.int64 )
+
+    return ix, iy
+
+
+def getCoordinates( df, crs=None ):
+
+    """
+    projected point coordinates of geodataframe or x / y columns of dataframe
+    """
+
+    if isinstance( df, gpd.GeoDataFrame ):
+
+        # optional reprojection - cell sizes are in projected units
+        if crs is not None:
+            df = df.to_crs( crs )
+
+        if df.crs is not None and df.crs.is_geographic:
+            raise ValueError( 'grid aggregation requires projected coordinates - supply crs' )
+
+        return df.geometry.x.to_numpy(), df.geometry.y.to_numpy(), df.crs
+
+    return df[ 'x' ].to_numpy(), df[ 'y' ].to_numpy(), crs
+
+
+def dropNonFinite( df, x, y ):
+
+    """
+    exclude rows with missing or empty geometry - nan coordinates would bin into bogus cells
+    """
+
+    valid = np.isfinite( x ) & np.isfinite( y )
+    if valid.all():
+        return df, x, y
+
+    return df[ valid ], x[ valid ], y[ valid ]
+
+
+def aggregateCells( df, cell_size, columns=None, reducers=( 'median', 'count' ), origin=( 0.0, 0.0 ), crs=None, polygons=False ):
+
+    """
+    reduce point values per grid cell - cell polygons only built on request
+    """
+
+    x, y, crs = getCoordinates( df, crs )
+    df, x, y = dropNonFinite( df, x, y )
+    ix, iy = getCellIndices( x, y, cell_size, origin )
+
+    # default to all numeric columns
+    if columns is None:
+        columns = [ name for name in df.select_dtypes( include='number' ).columns if name not in [ 'x', 'y' ] ]
+
+    # plain columnar frame - no geometry carried through groupby
+    data = { name : df[ name ].to_numpy() for name in columns }
+    data.update( ix=ix, iy=iy )
+
+    grouped = pd.DataFrame( data, copy=False ).groupby( [ 'ix', 'iy' ], sort=True )
+
+    # cythonised reducers per column - flattened to column_reducer names
+    agg = grouped[ columns ].agg( list( reducers ) )
+    agg.columns = [ f'{name}_{reducer}' for name, reducer in agg.columns ]
+    agg.insert( 0, 'count', grouped.size() )
+    agg = agg.reset_index()
+
+    # cell centre coordinates
+    agg[ 'x' ] = origin[ 0 ] + ( agg[ 'ix' ] + 0.5 ) * cell_size
+    agg[ 'y' ] = origin[ 1 ] + ( agg[ 'iy' ] + 0.5 ) * cell_size
+
+    if polygons:
+        return gpd.GeoDataFrame( agg, geometry=getCellPolygons( agg[ 'ix' ], agg[ 'iy' ], cell_size, origin ), crs=crs )
+
+    return agg
+
+
+def getCellPolygons( ix, iy, cell_size, origin=( 0.0, 0.0 ) ):
+
+    """
+    vectorised cell polygons from integer cell indices
+    """
+
+    xmin = origin[ 0 ] + np.asarray( ix ) * cell_size
+    ymin = origin[ 1 ] + np.asarray( iy ) * cell_size
+
+    return shapely.box( xmin, ymin, xmin + cell_size, ymin + cell_size )
+
+
+def getGrid( bounds, cell_size, origin=( 0.0, 0.0 ), crs=None ):
+
+    """
+    full polygon grid covering bounds - for plotting / overlays only
+    """
+
+    xmin, ymin, xmax, ymax = bounds
+    ix0, iy0 = getCellIndices( xmin, ymin, cell_size, origin )
+    ix1, iy1 = getCellIndices( xmax, ymax, cell_size, origin )
+
+    ix, iy = np.meshgrid( np.arange( ix0, ix1 + 1 ), np.arange( iy0, iy1 + 1 ), indexing='ij' )
+    ix, iy = ix.ravel(), iy.ravel()
+
+    return gpd.GeoDataFrame( { 'ix' : ix, 'iy' : iy }, geometry=getCellPolygons( ix, iy, cell_size, origin ), crs=crs )
@@ -1,14 +1,19 @@
 import os
+import time
 import yaml
 import glob
 import argparse
+import numpy as np
 import geopandas as gpd
 
 from munch import munchify
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from shapely.ops import orient
-from sqlalchemy import create_engine
 
 from gedil4a import GediL4a
+from shotindex import ShotIndex
+from sqlalchemy import inspect, text
+from storage import getStore, PostgisStore
 
 
 def getAoi( path, names ):
@@ -34,43 +39,173 @@ def getAoi( path, names ):
     return counties
 
 
-def writeToDataTable( pathname, aoi, config ):
+def createDataTable( store, config, gdf ):
+
+    """
+    createDataTable
+    """
+
+    # parquet datasets partitioned on write
+    if not isinstance( store, PostgisStore ):
+        return
+
+    name, schema = config.table.name, config.table.schema
+    table = f'{schema}.{name}'
+
+    with store.engine.begin() as connection:
+
+        # serialise table creation across worker processes
+        connection.execute( text( 'SELECT pg_advisory_xact_lock( hashtext( :table ) )' ), { 'table' : table } )
+        if not inspect( connection ).has_table( name, schema=schema ):
+
+            # create empty table from chunk schema - also creates shot_number btree + geometry gist indexes
+            gdf.head( 0 ).to_postgis( name, connection, schema=schema, index=True )
+
+            # partition into time chunks where timescaledb available
+            if connection.execute( text( "SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'" ) ).first() is not None:
+                connection.execute( text( 'SELECT create_hypertable( :table, \'datetime\', chunk_time_interval => CAST( :interval AS INTERVAL ), if_not_exists => TRUE )' ), 
+                                    { 'table' : table, 'interval' : config.table.get( 'chunk_interval', '1 month' ) } )
+            else:
+                # no native partitioning fallback - table is a single heap relying on date + brin indexes
+                print ( f'timescaledb extension not installed - {table} created as a single unpartitioned table' )
+
+        # stored acquisition date + indexes serving curator queries - shot_number + geometry indexed on creation
+        for command in [    f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS date DATE GENERATED ALWAYS AS ( CAST( datetime AS DATE ) ) STORED',
+                            f'CREATE INDEX IF NOT EXISTS {name}_date_agbd_idx ON {table} ( date, agbd )',
+                            f'CREATE INDEX IF NOT EXISTS {name}_datetime_brin_idx ON {table} USING BRIN ( datetime )',
+                            f'CREATE INDEX IF NOT EXISTS {name}_filename_idx ON {table} ( filename )' ]:
+            connection.execute( text( command ) )
+
+    return
+
+
+def writeToDataTable( pathname, aoi, config, chunk_size=100000, store=None, ranges=None ):
 
     """
     writeToDataTable
     """
 
-    try:
+    # reuse caller storage backend where available
+    if store is None:
+        store = getStore( config )
 
-        # get beam data
-        obj = GediL4a( pathname )
-        gdf = obj.getBeamData( aoi=aoi.geometry.iloc[ 0 ] )
+    # stream beam data in bounded chunks
+    rows = 0
+    obj = GediL4a( pathname )
+    for gdf in obj.iterBeamData( aoi=aoi, chunk_size=chunk_size, ranges=ranges ):
 
         gdf[ 'filename' ] = os.path.basename( pathname )
+
+        # native uint64 shot numbers unsupported by sql writers
+        gdf[ 'shot_number' ] = gdf[ 'shot_number' ].astype( np.int64 )
         gdf = gdf.set_index( 'shot_number' )
 
-        # set up database connection engine
-        server = config.server
-        connection = 'postgresql://{user}:{password}@{host}:{port}/{database}'.format( user=server.user, 
-                                                                                        password=server.password, 
-                                                                                        host=server.host, 
-                                                                                        port=server.port, 
-                                                                                        database=server.database )
-        engine = create_engine( connection )
-
-        # geoDataFrame to postGIS - append to existing table
-        gdf.to_postgis( con=engine,
-                        name=config.table.name,
-                        schema=config.table.schema,
-                        if_exists='append', 
-                        index=True )
-
-    except BaseException as err:
-        # print exception
+        # create + index target table once per process
+        if not _worker.get( 'prepared' ):
+            createDataTable( store, config, gdf )
+            _worker[ 'prepared' ] = True
+
+        # append to postGIS table or geoparquet dataset
+        store.write( gdf, config.table.name )
+        rows += len( gdf )
+
+    return rows
+
+
+# per-process worker state - aoi, config, store and manifest reused across granules
+_worker = {}
+
+
+def initWorker( aoi, config, chunk_size, ranges=None ):
+
+    """
+    initWorker
+    """
+
+    # one storage backend + database engine per worker process
+    store = getStore( config )
+    manifest = store.getManifest( config.table.name + '_manifest' )
+
+    _worker.update( aoi=aoi, config=config, chunk_size=chunk_size, ranges=ranges, store=store, manifest=manifest )
+    return
+
+
+def ingestGranule( pathname ):
+
+    """
+    ingestGranule
+    """
+
+    # skip granules already ingested with unchanged content
+    manifest = _worker[ 'manifest' ]
+    entry = manifest.getEntry( pathname )
+    if manifest.isComplete( pathname, entry=entry ):
+        return pathname, 'skipped', entry[ 'rows' ], 0.0
+
+    # time granule ingest - each call opens its own hdf5 handle
+    start = time.perf_counter()
+    try:
+
+        # clear out rows from previous failed or partial attempt
+        if entry is not None:
+            _worker[ 'store' ].delete( _worker[ 'config' ].table.name, os.path.basename( pathname ) )
+
+        manifest.begin( pathname )
+        rows = writeToDataTable(    pathname, 
+                                    _worker[ 'aoi' ], 
+                                    _worker[ 'config' ], 
+                                    chunk_size=_worker[ 'chunk_size' ], 
+                                    store=_worker[ 'store' ],
+                                    ranges=_worker[ 'ranges' ].get( os.path.basename( pathname ) ) if _worker[ 'ranges' ] is not None else None )
+
+        manifest.complete( pathname, rows, time.perf_counter() - start )
+        return pathname, 'done', rows, time.perf_counter() - start
+
+    except Exception as err:
+
+        # record failure for retry on next run
         print ( 'Exception reading {pathname} : {msg}'.format( pathname=pathname, msg=str ( err ) ) )
-        pass
-        
-    return 
+        manifest.fail( pathname, err, time.perf_counter() - start )
+        return pathname, 'failed', 0, time.perf_counter() - start
+
+
+def ingestGranules( pathnames, aoi, config, processes=1, chunk_size=100000, ranges=None ):
+
+    """
+    ingestGranules
+    """
+
+    def report( pathname, status, rows, elapsed ):
+        print ( '{name} : {status} - {rows} rows in {elapsed:.1f}s'.format( name=os.path.basename( pathname ), 
+                                                                            status=status, 
+                                                                            rows=rows, 
+                                                                            elapsed=elapsed ) )
+        return status, rows
+
+    results = []
+    if processes > 1:
+
+        # distribute granules across process pool
+        with ProcessPoolExecutor(   max_workers=processes, 
+                                    initializer=initWorker, 
+                                    initargs=( aoi, config, chunk_size, ranges ) ) as pool:
+
+            futures = [ pool.submit( ingestGranule, pathname ) for pathname in pathnames ]
+            for future in as_completed( futures ):
+                results.append( report( *future.result() ) )
+
+    else:
+
+        # sequential ingest in current process
+        initWorker( aoi, config, chunk_size, ranges )
+        for pathname in pathnames:
+            results.append( report( *ingestGranule( pathname ) ) )
+
+    # summary
+    counts = { status : sum( s == status for s, rows in results ) for status in [ 'done', 'skipped', 'failed' ] }
+    print ( 'ingested {done} granules - {rows} rows - {skipped} skipped - {failed} failed'.format( rows=sum( rows for status, rows in results if status == 'done' ), 
+                                                                                                   **counts ) )
+    return results
 
 
 def parseArguments(args=None):
@@ -86,6 +221,11 @@ def parseArguments(args=None):
     parser.add_argument('data_path', action='store', help='path to level-4a datasets' )
     parser.add_argument('db_file', action='store', help='yaml database configuration file' )
 
+    # optional args
+    parser.add_argument('--chunk_size', type=int, help='max rows written per chunk', default=100000 )
+    parser.add_argument('--processes', type=int, help='number of worker processes', default=1 )
+    parser.add_argument('--index_file', type=str, help='parquet shot index restricting reads to aoi blocks', default=None )
+
     return parser.parse_args(args)
 
 
@@ -107,5 +247,15 @@ if __name__ == '__main__':
 
     # write datasets to postgis data table
     pathnames = glob.glob( '{path}/*.h5'.format( path=args.data_path ) ) 
-    for idx, pathname in enumerate( pathnames ):
-        writeToDataTable( pathname, aoi, db_config )
+
+    # optionally read only granule / beam / shot ranges overlapping aoi
+    ranges = None
+    if args.index_file is not None:
+
+        # granules missing from index read in full - indexed granules without aoi blocks skipped
+        index = ShotIndex( args.index_file )
+        ranges = index.query( aoi.geometry.iloc[ 0 ] )
+        indexed = set( index.data[ 'filename' ] )
+        pathnames = [ pathname for pathname in pathnames if os.path.basename( pathname ) in ranges or os.path.basename( pathname ) not in indexed ]
+
+    ingestGranules( pathnames, aoi.geometry.iloc[ 0 ], db_config, processes=args.processes, chunk_size=args.chunk_size, ranges=ranges )
@@ -1,14 +1,20 @@
 import os
 import glob
+import time
 import yaml
-import json
+import queue
 import argparse
+import threading
 import numpy as np
 import pandas as pd
 
 from munch import munchify
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
 from sentinelhub import parse_time
-from sqlalchemy import create_engine
+
+from s3util import S3Util
+from storage import getStore
+from statsparser import StatsParser, HistogramError, concatColumns, isCompatible, getHistogram, loadJson
 
 """
 SQL commands
@@ -32,13 +38,13 @@ def writeToDatabase( df ):
     df[ 'interval_from' ] = pd.to_datetime( df[ 'interval_from' ], utc=True)
     df[ 'interval_to' ] = pd.to_datetime( df[ 'interval_to' ], utc=True )
 
-    # write to data table
-    return df.to_sql(   config.table.name, 
-                        engine, 
-                        schema=config.schema, 
-                        if_exists='append',
-                        index=True,
-                        index_label='shot_number' )
+    # shared histogram bin edges stored once per band
+    edges = df.attrs.get( 'histogram_edges' )
+    if edges:
+        store.writeBinEdges( config.table.name, { key.replace( "stats_", "" ).lower() : value for key, value in edges.items() } )
+
+    # bulk write to data table or geoparquet dataset
+    return store.write( df, config.table.name )
 
 
 def convertToDataFrame( data ):
@@ -82,21 +88,9 @@ def convertToDataFrame( data ):
                 # response includes histogram analysis
                 if band_values.get( 'histogram' ) is not None:
 
-                    # copy raw result
+                    # copy raw result with normalised counts + bin edges
                     col_name = f'{output_name}_{band_name}_histogram'
-                    entry[ col_name ] = band_values.get( 'histogram' )
-
-                    # add normalised counts
-                    counts = [ value[ 'count' ] for value in entry[ col_name ][ 'bins' ] ]
-                    total_counts = sum(counts)
-                    
-                    entry[ col_name ][ 'normalised_counts' ] = [ round(100 * count / total_counts) if total_counts > 0 else 0 for count in counts ]
-                    entry[ col_name ][ 'total_counts' ] = total_counts
-
-                    # add bin edges into array for easy access
-                    edges = [ value[ 'lowEdge' ] for value in entry[ col_name ][ 'bins' ] ]
-                    edges.append( entry[ col_name ][ 'bins' ][ -1 ][ 'highEdge'] )
-                    entry[ col_name ][ 'bin_edges'] = edges
+                    entry[ col_name ] = getHistogram( band_values.get( 'histogram' ) )
 
 
         # append if valid entry
@@ -106,17 +100,185 @@ def convertToDataFrame( data ):
     return pd.DataFrame( records )
 
 
-def getEngine( config ):
+# per-process response parser - column layout compiled from first file
+_parser = StatsParser()
+
+
+def initParser( histogram='compact' ):
+
+    """
+    create per-process response parser with selected histogram mode
+    """
+
+    global _parser
+    _parser = StatsParser( histogram=histogram )
+    return
+
+
+def parseFile( pathname, required=None ):
+
+    """
+    load batch result json file into dict of column arrays + histogram bin edges - None if no valid records
+    """
+
+    # load json file
+    obj = loadJson( pathname )
+
+    # compiled layout with generic fallback
+    try:
+        columns = _parser.parseColumns( obj[ 'response' ] )
+
+    except HistogramError as err:
+
+        # compact storage impossible for this file - skip rather than abort pipeline
+        print ( 'Skipping {pathname} : {msg} (rerun with --histogram raw)'.format( pathname=pathname, msg=str( err ) ) )
+        return None
+
+    if columns is None:
+        df = convertToDataFrame( obj[ 'response' ] )
+        columns = { name : df[ name ].to_numpy() for name in df.columns }
+
+    n = len( next( iter( columns.values() ) ) ) if columns else 0
+    if n == 0:
+        return None
+
+    # optionally require column containing substring
+    if required is not None and not next((True for col in columns if required in col), False):
+        return None
+
+    columns = { 'shot_number' : np.full( n, obj[ 'identifier' ] ), **columns }
+    return columns, dict( _parser.histogram_edges )
+
+
+def writeBatches( frames, write, batch_size, stats ):
+
+    """
+    writer stage - buffer parsed column arrays and flush fixed size batches
+    """
+
+    buffer, rows, edges = [], 0, {}
+    while True:
+
+        # blocks until parse stage delivers columns - None signals end of stream
+        item = frames.get()
+
+        # after write failure drain queue without writing until parse stage stops
+        if 'error' in stats:
+            if item is None:
+                break
+            continue
+
+        if item is not None:
+
+            # parse workers hold own shared edges - files disagreeing with edges already accepted are skipped
+            columns, values = item
+            if isCompatible( edges, values ):
+                buffer.append( columns )
+                rows += len( columns[ 'shot_number' ] )
+                edges.update( values )
+            else:
+                print ( 'Skipping shot {shot} : histogram bin edges differ from shared edges (rerun with --histogram raw)'.format( shot=columns[ 'shot_number' ][ 0 ] ) )
+
+        # flush full batches - remainder carried forward
+        while rows >= batch_size or ( item is None and rows > 0 ):
 
+            # single dataframe per batch rather than per file
+            data = concatColumns( buffer )
+            buffer = [ { name : values[ batch_size : ] for name, values in data.items() } ]
+            rows = len( buffer[ 0 ][ 'shot_number' ] )
 
-    server = config.server
-    connection = 'postgresql://{user}:{password}@{host}:{port}/{database}'.format( user=server.user, 
-                                                                                    password=server.password, 
-                                                                                    host=server.host, 
-                                                                                    port=server.port, 
-                                                                                    database=server.database )
+            # carry shared histogram bin edges with batch
+            batch = pd.DataFrame( { name : values[ : batch_size ] for name, values in data.items() } )
+            batch.attrs[ 'histogram_edges' ] = dict( edges )
 
-    return create_engine( connection )
+            try:
+                write( batch )
+                stats[ 'rows' ] += len( batch )
+
+            except Exception as err:
+
+                # stop on first failure - failed batch kept with remainder and reported as unwritten
+                buffer, rows = [ data ], len( data[ 'shot_number' ] )
+                print ( 'Exception writing batch : {msg} - {rows} buffered rows not written'.format( msg=str( err ), rows=rows ) )
+                stats[ 'error' ] = err
+                break
+
+        if item is None:
+            break
+
+    return
+
+
+def runPipeline( pathnames, write, required=None, workers=4, batch_size=20000, queue_size=16, histogram='compact' ):
+
+    """
+    parse json files in process pool and write batches from dedicated writer thread
+    """
+
+    # bounded queue between parse and write stages provides backpressure
+    frames = queue.Queue( maxsize=queue_size )
+    stats = { 'files' : 0, 'rows' : 0 }
+    start = time.perf_counter()
+
+    writer = threading.Thread( target=writeBatches, args=( frames, write, batch_size, stats ) )
+    writer.start()
+
+    def report():
+        elapsed = max( time.perf_counter() - start, 1e-9 )
+        print ( 'files: {files} ({fps:.1f}/s) - rows written: {rows} ({rps:.1f}/s)'.format( fps=stats[ 'files' ] / elapsed, 
+                                                                                            rps=stats[ 'rows' ] / elapsed, 
+                                                                                            **stats ) )
+
+    try:
+
+        with ProcessPoolExecutor( max_workers=workers, initializer=initParser, initargs=( histogram, ) ) as pool:
+
+            # limit files in flight to bound memory held by parse stage
+            pending = set()
+            for pathname in pathnames:
+
+                # stop parsing on first write failure
+                if 'error' in stats:
+                    break
+
+                pending.add( pool.submit( parseFile, pathname, required ) )
+                if len( pending ) >= queue_size:
+                    done, pending = wait( pending, return_when=FIRST_COMPLETED )
+                    for future in done:
+                        
+                        result = future.result()
+                        stats[ 'files' ] += 1
+                        if result is not None:
+                            frames.put( result )
+
+                        if stats[ 'files' ] % 1000 == 0:
+                            report()
+
+            # drain remaining parse results
+            for future in as_completed( pending ):
+
+                # cancel queued parse jobs after write failure
+                if 'error' in stats:
+                    for future in pending:
+                        future.cancel()
+                    break
+
+                result = future.result()
+                stats[ 'files' ] += 1
+                if result is not None:
+                    frames.put( result )
+
+    finally:
+
+        # signal end of stream and wait for final flush
+        frames.put( None )
+        writer.join()
+
+    report()
+    if 'error' in stats:
+        raise stats[ 'error' ]
+
+    return stats
 
 
 def parseArguments(args=None):
@@ -129,6 +291,17 @@ def parseArguments(args=None):
     parser = argparse.ArgumentParser(description='curator')
     parser.add_argument('data_path', action='store', help='data path' )
 
+    # optional args
+    parser.add_argument('--workers', type=int, help='parse worker processes', default=4 )
+    parser.add_argument('--batch_size', type=int, help='rows per database write', default=20000 )
+    parser.add_argument('--queue_size', type=int, help='max parsed files buffered ahead of writer', default=16 )
+    parser.add_argument('--histogram', type=str, choices=[ 'compact', 'raw' ], help='histogram storage mode', default='compact' )
+
+    # optional sync of batch api outputs from s3
+    parser.add_argument('--bucket', type=str, help='batch api output bucket', default=None )
+    parser.add_argument('--prefix', type=str, help='batch api output prefix', default='' )
+    parser.add_argument('--transfers', type=int, help='concurrent s3 downloads', default=16 )
+
     return parser.parse_args(args)
 
 
@@ -149,39 +322,23 @@ if __name__ == '__main__':
     config.schema = 'kenya'
     config.table.name = 's2_bio_dumper'
 
-    # set up database connection engine
-    engine = getEngine( config )
-
-    #records = pd.read_sql( 'SELECT DISTINCT (shot_number) FROM kenya.s2_dumper',
-    #                        engine )
-
-    subset = pd.DataFrame()
-
-    # get files in data path
-    pathnames = glob.glob( os.path.join( args.data_path, '*.json' ), recursive=True )
-    for idx, pathname in enumerate( pathnames ):
-
-        # load json file
-        with open( pathname, 'r' ) as f:
-            obj = json.load( f )
-
-        #if np.int64(  obj[ 'identifier' ] ) not in records[ 'shot_number' ].values:
-
-        # create dataframe
-        df = convertToDataFrame( obj[ 'response' ] )
-        if len( df ) > 0 and next((True for col in df.columns if 'lai' in col), False):
-
-            df.insert( 0, 'shot_number', obj[ 'identifier' ] )
-            subset = pd.concat( [ x for x in [ df, subset ] if not x.empty ], ignore_index=True )
+    # set up storage backend - postgis or geoparquet
+    store = getStore( config, schema=config.schema )
 
-            # concat dataframe to aggregated subset
-            if len( subset ) > 20000:
+    # parse + write json files through pipeline
+    if args.bucket is not None:
 
-                # write records to database
-                writeToDatabase( subset )
-                subset = pd.DataFrame()
+        # mirror batch api outputs to data path - unchanged local copies not downloaded again
+        bucket = S3Util.getS3Bucket( args.bucket )
+        pathnames = S3Util.syncPrefix( bucket, args.prefix, args.data_path, workers=args.transfers )
 
+    else:
+        pathnames = glob.glob( os.path.join( args.data_path, '*.json' ), recursive=True )
 
-    # write records to database
-    if len( subset ) > 0:
-        writeToDatabase( subset )
+    runPipeline(    pathnames, 
+                    writeToDatabase, 
+                    required='lai', 
+                    workers=args.workers, 
+                    batch_size=args.batch_size, 
+                    queue_size=args.queue_size,
+                    histogram=args.histogram )
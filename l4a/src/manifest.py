@@ -0,0 +1,161 @@
+import os
+import hashlib
+
+from sqlalchemy import text
+
+
+class Manifest():
+
+    # constants
+    block_size = 8 * 1024 * 1024
+
+
+    def __init__( self, engine, name, schema=None ):
+
+        """
+        constructor
+        """
+
+        # manifest table keyed by granule filename
+        self._engine = engine
+        self._table = f'{schema}.{name}' if schema is not None else name
+
+        self.createTable()
+        return
+
+
+    def createTable( self ):
+
+        """
+        create manifest table if not exists
+        """
+
+        command = f""" \
+            CREATE TABLE IF NOT EXISTS {self._table} ( \
+                filename TEXT PRIMARY KEY, \
+                checksum TEXT, \
+                size BIGINT, \
+                mtime DOUBLE PRECISION, \
+                status TEXT NOT NULL, \
+                rows BIGINT, \
+                duration DOUBLE PRECISION, \
+                error TEXT, \
+                updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ) \
+            """
+
+        with self._engine.begin() as connection:
+
+            # concurrent create table if not exists unsafe in postgresql - serialise across worker processes
+            if self._engine.dialect.name == 'postgresql':
+                connection.execute( text( 'SELECT pg_advisory_xact_lock( hashtext( :table ) )' ), { 'table' : self._table } )
+
+            connection.execute( text( command ) )
+
+        return
+
+
+    def getEntry( self, pathname ):
+
+        """
+        get manifest record for granule - None if not yet seen
+        """
+
+        command = f'SELECT * FROM {self._table} WHERE filename = :filename'
+        with self._engine.connect() as connection:
+            row = connection.execute( text( command ), { 'filename' : os.path.basename( pathname ) } ).mappings().first()
+
+        return dict( row ) if row is not None else None
+
+
+    def isComplete( self, pathname, entry=None ):
+
+        """
+        check granule already ingested with unchanged content
+        """
+
+        if entry is None:
+            entry = self.getEntry( pathname )
+
+        if entry is None or entry[ 'status' ] != 'done':
+            return False
+
+        # unchanged size + mtime avoids re-hashing finished granules
+        stat = os.stat( pathname )
+        if entry[ 'size' ] == stat.st_size and entry[ 'mtime' ] == stat.st_mtime:
+            return True
+
+        return entry[ 'checksum' ] == Manifest.getChecksum( pathname )
+
+
+    def begin( self, pathname ):
+
+        """
+        mark granule ingest as running
+        """
+
+        stat = os.stat( pathname )
+        self.setEntry(  pathname,
+                        status='running',
+                        checksum=Manifest.getChecksum( pathname ),
+                        size=stat.st_size,
+                        mtime=stat.st_mtime )
+        return
+
+
+    def complete( self, pathname, rows, duration ):
+
+        """
+        mark granule ingest as done
+        """
+
+        self.setEntry( pathname, status='done', rows=rows, duration=duration, error=None )
+        return
+
+
+    def fail( self, pathname, error, duration ):
+
+        """
+        mark granule ingest as failed
+        """
+
+        self.setEntry( pathname, status='failed', duration=duration, error=str( error ) )
+        return
+
+
+    def setEntry( self, pathname, **values ):
+
+        """
+        upsert manifest record
+        """
+
+        values[ 'filename' ] = os.path.basename( pathname )
+        columns = list( values.keys() )
+
+        # insert new record or update supplied fields of existing record
+        command = """ \
+            INSERT INTO {table} ( {columns} ) VALUES ( {params} ) \
+                ON CONFLICT ( filename ) DO UPDATE SET {updates}, updated = CURRENT_TIMESTAMP \
+            """.format( table=self._table,
+                        columns=', '.join( columns ),
+                        params=', '.join( f':{column}' for column in columns ),
+                        updates=', '.join( f'{column} = EXCLUDED.{column}' for column in columns ) )
+
+        with self._engine.begin() as connection:
+            connection.execute( text( command ), values )
+
+        return
+
+
+    @staticmethod
+    def getChecksum( pathname ):
+
+        """
+        md5 checksum of file content
+        """
+
+        md5 = hashlib.md5()
+        with open( pathname, 'rb' ) as f:
+            for block in iter( lambda: f.read( Manifest.block_size ), b'' ):
+                md5.update( block )
+
+        return md5.hexdigest()
@@ -0,0 +1,183 @@
+import asyncio
+import sqlite3
+
+from datetime import datetime, timezone
+
+
+class Orchestrator():
+
+    # batch api request states
+    terminal_states = [ 'DONE', 'PARTIAL', 'FAILED', 'CANCELED' ]
+
+
+    def __init__( self, client, pathname, concurrency=8, min_delay=5.0, max_delay=300.0, max_errors=10 ):
+
+        """
+        constructor
+        """
+
+        # synchronous batch api client - calls run in worker threads
+        self._client = client
+        self._semaphore = None
+        self._concurrency = concurrency
+
+        # polling backoff
+        self._min_delay = min_delay
+        self._max_delay = max_delay
+        self._max_errors = max_errors
+
+        # request state persisted in local sqlite file
+        self._db = sqlite3.connect( pathname )
+        self._db.execute( """ \
+            CREATE TABLE IF NOT EXISTS requests ( \
+                request_id TEXT PRIMARY KEY, \
+                status TEXT, \
+                completion REAL, \
+                errors INTEGER DEFAULT 0, \
+                updated TEXT ) \
+            """ )
+        self._db.commit()
+        return
+
+
+    def register( self, request_ids ):
+
+        """
+        add request ids to state store - existing state retained
+        """
+
+        self._db.executemany( 'INSERT OR IGNORE INTO requests ( request_id, status, updated ) VALUES ( ?, NULL, ? )',
+                              [ ( request_id, self.getTimestamp() ) for request_id in request_ids ] )
+        self._db.commit()
+        return
+
+
+    def getPending( self ):
+
+        """
+        request ids not yet in terminal state
+        """
+
+        placeholders = ', '.join( '?' for _ in self.terminal_states )
+        rows = self._db.execute( f'SELECT request_id FROM requests WHERE status IS NULL OR status NOT IN ( {placeholders} )',
+                                 self.terminal_states ).fetchall()
+
+        return [ row[ 0 ] for row in rows ]
+
+
+    def getStates( self ):
+
+        """
+        current state of all tracked requests
+        """
+
+        return dict( self._db.execute( 'SELECT request_id, status FROM requests' ).fetchall() )
+
+
+    def setState( self, request_id, status, completion=None, error=False ):
+
+        """
+        persist request state
+        """
+
+        self._db.execute( """ \
+            UPDATE requests SET status = COALESCE( ?, status ), completion = COALESCE( ?, completion ), \
+                errors = errors + ?, updated = ? WHERE request_id = ? \
+            """, ( status, completion, int( error ), self.getTimestamp(), request_id ) )
+        self._db.commit()
+        return
+
+
+    async def call( self, func, *args ):
+
+        """
+        run blocking client call in thread under concurrency limit
+        """
+
+        async with self._semaphore:
+            return await asyncio.to_thread( func, *args )
+
+
+    async def drive( self, request_id ):
+
+        """
+        advance single request through CREATED -> ANALYSIS_DONE -> PROCESSING -> DONE
+        """
+
+        delay, errors, previous = self._min_delay, 0, None
+        while True:
+
+            try:
+
+                # get current status of api request
+                response = await self.call( self._client.getStatus, request_id )
+                status = response[ 'status' ]
+                self.setState( request_id, status, response.get( 'completionPercentage' ) )
+
+                # max errors counts consecutive failures only
+                errors = 0
+
+                # request created -> analyse
+                if status == 'CREATED':
+                    status_code = await self.call( self._client.setAnalysis, request_id )
+                    print( f'Set Analysis: {request_id} -> {status_code}' )
+
+                # analysis complete -> start
+                if status == 'ANALYSIS_DONE':
+                    status_code = await self.call( self._client.startRequest, request_id )
+                    print( f'Start Request: {request_id} -> {status_code}' )
+
+                # processing request
+                if status == 'PROCESSING':
+                    print( 'Processing Request: {id} - completed {pc}%'.format( id=request_id, pc=response.get( 'completionPercentage' ) ) )
+
+                # processing finished
+                if status in self.terminal_states:
+                    print( f'Request {status.lower()}: {request_id}' )
+                    return status
+
+                # poll quickly after state change - back off while state unchanged
+                delay = self._min_delay if status != previous else min( delay * 2, self._max_delay )
+                previous = status
+
+            except Exception as err:
+
+                # transient api failure - back off and retry
+                errors += 1
+                self.setState( request_id, None, error=True )
+                print( f'Exception polling {request_id} : {err}' )
+
+                if errors >= self._max_errors:
+                    return None
+
+                delay = min( delay * 2, self._max_delay )
+
+            await asyncio.sleep( delay )
+
+
+    async def run( self, request_ids=None ):
+
+        """
+        drive all registered non-terminal requests to completion
+        """
+
+        if request_ids is not None:
+            self.register( request_ids )
+
+        # semaphore bound to running event loop
+        self._semaphore = asyncio.Semaphore( self._concurrency )
+
+        pending = self.getPending()
+        results = await asyncio.gather( *[ self.drive( request_id ) for request_id in pending ] )
+
+        return dict( zip( pending, results ) )
+
+
+    @staticmethod
+    def getTimestamp():
+
+        """
+        utc timestamp string
+        """
+
+        return datetime.now( timezone.utc ).isoformat()
@@ -3,11 +3,17 @@ import boto3
 
 from operator import attrgetter
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from botocore.config import Config
+from boto3.s3.transfer import TransferConfig
 
 class S3Util():
 
     _obj = namedtuple('S3Obj', ['key', 'mtime', 'size', 'ETag'])
 
+    # constants
+    megabyte = 1024 * 1024
+
     @staticmethod
     def getS3Bucket( name ):
         
@@ -107,9 +113,10 @@ class S3Util():
                 q = [S3Util._obj(f['Prefix'], None, None, None) for f in resp['CommonPrefixes']]
             if 'Contents' in resp and list_objs:
                 q += [S3Util._obj(f['Key'], f['LastModified'], f['Size'], f['ETag']) for f in resp['Contents']]
-            # note: even with sorted lists, it is faster to sort(a+b)
-            # than heapq.merge(a, b) at least up to 10K elements in each list
-            q = sorted(q, key=attrgetter('key'))
+            # note: prefixes and contents are each returned in key order - only
+            # a page holding both needs merging, sort(a+b) beats heapq.merge(a, b)
+            if 'CommonPrefixes' in resp and 'Contents' in resp and list_dirs and list_objs:
+                q = sorted(q, key=attrgetter('key'))
             if limit is not None:
                 q = q[:limit]
                 limit -= len(q)
@@ -130,6 +137,55 @@ class S3Util():
         return s
 
 
+    @staticmethod
+    def getTransferConfig( multipart_threshold=64, multipart_chunksize=64, max_concurrency=10 ):
+
+        """
+        multipart transfer configuration - sizes in megabytes
+        """
+
+        return TransferConfig(  multipart_threshold=multipart_threshold * S3Util.megabyte,
+                                multipart_chunksize=multipart_chunksize * S3Util.megabyte,
+                                max_concurrency=max_concurrency,
+                                use_threads=True )
+
+
+    @staticmethod
+    def getClient( bucket, workers, config ):
+
+        """
+        low level client with connection pool sized for concurrent multipart transfers
+        """
+
+        # default pool of 10 connections shared by workers x max_concurrency transfer threads
+        client = bucket.meta.client
+        return boto3.client( 's3',
+                             region_name=client.meta.region_name,
+                             endpoint_url=client.meta.endpoint_url,
+                             config=client.meta.config.merge( Config( max_pool_connections=max( workers * config.max_request_concurrency, 10 ) ) ) )
+
+
+    @staticmethod
+    def getObjects( bucket, prefix ):
+
+        """
+        map of key to S3Obj under prefix from single paginated listing
+        """
+
+        return { obj.key : obj for obj in S3Util.getListing( bucket, prefix, list_dirs=False ) }
+
+
+    @staticmethod
+    def getKey( prefix, pathname ):
+
+        """
+        object key for local file under prefix
+        """
+
+        key = '{prefix}/{basename}'.format( prefix=prefix, basename=os.path.basename( pathname ) )
+        return key.replace(os.sep, '/' )
+
+
     @staticmethod
     def uploadFile( bucket, pathname, prefix ):
     
@@ -137,15 +193,80 @@ class S3Util():
         upload cog to s3 bucket storage
         """
 
-        # get pathname
-        s3_pathname = '{prefix}/{basename}'.format( prefix=prefix, basename=os.path.basename( pathname ) )
-        s3_pathname = s3_pathname.replace(os.sep, '/' )
+        return S3Util.uploadFiles( bucket, [ pathname ], prefix, workers=1 )[ 0 ]
 
-        objs = list( bucket.objects.filter(Prefix=s3_pathname, MaxKeys=1) )
-        if len( objs ) == 0:
-        
-            # bucket details
-            bucket.upload_file( pathname, s3_pathname )
 
-        return 's3://{name}/{pathname}'.format( name=bucket.name, pathname=s3_pathname )
+    @staticmethod
+    def uploadFiles( bucket, pathnames, prefix, workers=8, overwrite=False, config=None ):
+
+        """
+        concurrent multipart upload of files to prefix - existing objects skipped
+        """
+
+        keys = [ S3Util.getKey( prefix, pathname ) for pathname in pathnames ]
+        config = config if config is not None else S3Util.getTransferConfig()
+
+        # one listing over common key prefix replaces per file existence checks
+        existing = S3Util.getObjects( bucket, os.path.commonprefix( keys ) ) if keys and not overwrite else {}
+
+        # low level client is thread safe - resources are not
+        client = S3Util.getClient( bucket, workers, config )
+
+        with ThreadPoolExecutor( max_workers=workers ) as executor:
+
+            futures = [ executor.submit( client.upload_file, pathname, bucket.name, key, Config=config )
+                            for pathname, key in zip( pathnames, keys ) if key not in existing ]
+
+            # propagate transfer errors
+            for future in as_completed( futures ):
+                future.result()
+
+        return [ 's3://{name}/{key}'.format( name=bucket.name, key=key ) for key in keys ]
+
+
+    @staticmethod
+    def downloadFiles( bucket, objs, out_path, prefix='', workers=8, overwrite=False, config=None ):
+
+        """
+        concurrent multipart download of S3Obj list - relative key path under prefix retained
+        """
+
+        config = config if config is not None else S3Util.getTransferConfig()
+        client = S3Util.getClient( bucket, workers, config )
+
+        pathnames, transfers = [], []
+        for obj in objs:
+
+            # local pathname mirrors key below prefix
+            relative = obj.key[ len( prefix ): ].lstrip( '/' ) if obj.key.startswith( prefix ) else obj.key
+            pathname = os.path.join( out_path, *relative.split( '/' ) )
+            pathnames.append( pathname )
+
+            # skip local copies of matching size
+            if not overwrite and os.path.exists( pathname ) and os.path.getsize( pathname ) == obj.size:
+                continue
+
+            os.makedirs( os.path.dirname( pathname ), exist_ok=True )
+            transfers.append( ( obj.key, pathname ) )
+
+        with ThreadPoolExecutor( max_workers=workers ) as executor:
+
+            futures = [ executor.submit( client.download_file, bucket.name, key, pathname, Config=config )
+                            for key, pathname in transfers ]
+
+            # propagate transfer errors
+            for future in as_completed( futures ):
+                future.result()
+
+        return pathnames
+
+
+    @staticmethod
+    def syncPrefix( bucket, prefix, out_path, suffix='.json', workers=8, config=None ):
+
+        """
+        mirror batch api outputs under prefix to local disk - returns local pathnames
+        """
 
+        objs = [ obj for obj in S3Util.getObjects( bucket, prefix ).values() if suffix is None or obj.key.endswith( suffix ) ]
+        return S3Util.downloadFiles( bucket, objs, out_path, prefix=prefix, workers=workers, config=config )
@@ -0,0 +1,206 @@
+import os
+import glob
+import argparse
+import shapely
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+
+from gedil4a import GediL4a
+
+
+class ShotIndex():
+
+    # per block extents recorded in index
+    columns = [ 'filename', 'beam', 'start', 'stop', 'count',
+                'xmin', 'ymin', 'xmax', 'ymax',
+                'time_min', 'time_max',
+                'shot_min', 'shot_max' ]
+
+
+    def __init__( self, pathname ):
+
+        """
+        constructor
+        """
+
+        # index held in single local parquet file
+        self._pathname = pathname
+        self._df = pd.read_parquet( pathname ) if os.path.exists( pathname ) else pd.DataFrame( columns=self.columns )
+        return
+
+
+    @property
+    def data( self ):
+
+        """
+        index records
+        """
+
+        return self._df
+
+
+    def build( self, pathnames, block_size=10000, processes=1 ):
+
+        """
+        index granules - existing records for same granules replaced
+        """
+
+        # summarise granules sequentially or across process pool
+        if processes > 1:
+            with ProcessPoolExecutor( max_workers=processes ) as pool:
+                frames = list( pool.map( ShotIndex.getBlocks, pathnames, [ block_size ] * len( pathnames ) ) )
+        else:
+            frames = [ ShotIndex.getBlocks( pathname, block_size ) for pathname in pathnames ]
+
+        # replace records of re-indexed granules
+        filenames = [ os.path.basename( pathname ) for pathname in pathnames ]
+        df = self._df[ ~self._df[ 'filename' ].isin( filenames ) ]
+
+        # empty placeholder index excluded - object dtype columns would leak into numeric extents
+        frames = [ df ] + frames if len( df ) or not frames else frames
+        self._df = pd.concat( frames, ignore_index=True )[ self.columns ]
+        return self._df
+
+
+    def save( self, pathname=None ):
+
+        """
+        write index to parquet file
+        """
+
+        pathname = pathname if pathname is not None else self._pathname
+        os.makedirs( os.path.dirname( os.path.abspath( pathname ) ), exist_ok=True )
+
+        self._df.to_parquet( pathname, index=False )
+        return pathname
+
+
+    def query( self, aoi=None, start=None, end=None ):
+
+        """
+        blocks overlapping aoi and time window - adjacent blocks merged into read ranges
+        """
+
+        df = self._df
+        mask = np.ones( len( df ), dtype=bool )
+
+        # time window overlap
+        if start is not None:
+            mask &= ( df[ 'time_max' ] >= self.getTimestamp( start ) ).to_numpy()
+        if end is not None:
+            mask &= ( df[ 'time_min' ] <= self.getTimestamp( end ) ).to_numpy()
+
+        # block bounding box intersects aoi geometry
+        if aoi is not None:
+
+            xmin, ymin, xmax, ymax = aoi.bounds
+            mask &= ( ( df[ 'xmax' ] >= xmin ) & ( df[ 'xmin' ] <= xmax ) & ( df[ 'ymax' ] >= ymin ) & ( df[ 'ymin' ] <= ymax ) ).to_numpy()
+
+            rows = np.flatnonzero( mask )
+            if len( rows ):
+                subset = df.iloc[ rows ]
+                boxes = shapely.box( subset[ 'xmin' ], subset[ 'ymin' ], subset[ 'xmax' ], subset[ 'ymax' ] )
+                mask[ rows ] = shapely.intersects( aoi, boxes )
+
+        return self.getRanges( df[ mask ] )
+
+
+    @staticmethod
+    def getBlocks( pathname, block_size=10000 ):
+
+        """
+        summarise fixed shot index blocks of each beam in granule
+        """
+
+        # coordinates + times only - no geometry objects
+        df = GediL4a( pathname ).getGeolocationData( geometry=False, shot_index=True )
+        df = df.dropna( subset=[ 'lon', 'lat' ] )
+        df[ 'block' ] = df[ 'shot_index' ] // block_size
+
+        # extents per beam block
+        blocks = df.groupby( [ 'beam', 'block' ], observed=True ).agg(  count=( 'shot_index', 'size' ),
+                                                                        xmin=( 'lon', 'min' ),
+                                                                        ymin=( 'lat', 'min' ),
+                                                                        xmax=( 'lon', 'max' ),
+                                                                        ymax=( 'lat', 'max' ),
+                                                                        time_min=( 'datetime', 'min' ),
+                                                                        time_max=( 'datetime', 'max' ),
+                                                                        shot_min=( 'shot_number', 'min' ),
+                                                                        shot_max=( 'shot_number', 'max' ) ).reset_index()
+
+        # block shot index range - stop exclusive
+        blocks[ 'start' ] = blocks[ 'block' ] * block_size
+        blocks[ 'stop' ] = blocks[ 'start' ] + block_size
+        blocks[ 'beam' ] = blocks[ 'beam' ].astype( str )
+        blocks[ 'filename' ] = os.path.basename( pathname )
+
+        return blocks[ ShotIndex.columns ]
+
+
+    @staticmethod
+    def getRanges( df ):
+
+        """
+        { filename : { beam : [ ( start, stop ) ] } } with contiguous blocks merged
+        """
+
+        ranges = {}
+        for ( filename, beam ), group in df.sort_values( 'start' ).groupby( [ 'filename', 'beam' ] ):
+
+            merged = []
+            for start, stop in zip( group[ 'start' ].tolist(), group[ 'stop' ].tolist() ):
+                if merged and start <= merged[ -1 ][ 1 ]:
+                    merged[ -1 ] = ( merged[ -1 ][ 0 ], max( stop, merged[ -1 ][ 1 ] ) )
+                else:
+                    merged.append( ( start, stop ) )
+
+            ranges.setdefault( filename, {} )[ beam ] = merged
+
+        return ranges
+
+
+    @staticmethod
+    def getTimestamp( value ):
+
+        """
+        utc timestamp comparable with index times
+        """
+
+        value = pd.Timestamp( value )
+        return value.tz_localize( 'UTC' ) if value.tzinfo is None else value.tz_convert( 'UTC' )
+
+
+def parseArguments(args=None):
+
+    """
+    parse arguments
+    """
+
+    # parse command line arguments
+    parser = argparse.ArgumentParser(description='shot index')
+
+    # mandatory args
+    parser.add_argument('data_path', action='store', help='path to level-4a datasets' )
+    parser.add_argument('index_file', action='store', help='parquet index pathname' )
+
+    # optional args
+    parser.add_argument('--block_size', type=int, help='shots per indexed block', default=10000 )
+    parser.add_argument('--processes', type=int, help='number of worker processes', default=1 )
+
+    return parser.parse_args(args)
+
+
+# execute main
+if __name__ == '__main__':
+
+    # index granules in data path
+    args = parseArguments()
+    pathnames = glob.glob( '{path}/*.h5'.format( path=args.data_path ) )
+
+    index = ShotIndex( args.index_file )
+    df = index.build( pathnames, block_size=args.block_size, processes=args.processes )
+    index.save()
+
+    print ( 'indexed {granules} granules - {blocks} blocks'.format( granules=df[ 'filename' ].nunique(), blocks=len( df ) ) )
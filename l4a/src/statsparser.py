@@ -0,0 +1,295 @@
+import json
+import numpy as np
+import pandas as pd
+
+from datetime import date
+
+# optional fast json parser backend - fall back to stdlib
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+
+def loadJson( pathname ):
+
+    """
+    load json file with fastest available backend
+    """
+
+    with open( pathname, 'rb' ) as f:
+        return loads( f.read() )
+
+
+class HistogramError( Exception ):
+
+    """
+    histogram bins incompatible with compact storage
+    """
+
+    pass
+
+
+class StatsParser():
+
+    # statistics always integral - every other stat stored as float whatever json type first seen
+    counts = [ 'sampleCount', 'noDataCount' ]
+
+
+    def __init__( self, histogram='compact' ):
+
+        """
+        constructor
+        """
+
+        # column layout compiled from first response
+        self._bands = None
+
+        # histogram mode - compact integer arrays with shared bin edges or raw bins dict
+        self._histogram = histogram
+        self.histogram_edges = {}
+        return
+
+
+    def compile( self, data ):
+
+        """
+        derive column layout from first valid item of statistical api response - False if none valid
+        """
+
+        # ( output, band, [ ( column, stat, percentile, dtype ) ], histogram column )
+        item = next( ( item for item in data[ 'data' ] if isValid( item ) ), None )
+        if item is None:
+            return False
+
+        bands = []
+        for output_name, output_data in item['outputs'].items():
+            for band_name, band_values in output_data['bands'].items():
+
+                # generate unique names once - only count stats keep integer dtype
+                columns = []
+                for stat_name, value in band_values['stats'].items():
+                    col_name = f'{output_name}_{band_name}_{stat_name}'
+                    if stat_name == 'percentiles':
+                        for perc in value.keys():
+                            columns.append( ( f'{col_name}_{perc}', stat_name, perc, np.float64 ) )
+                    else:
+                        columns.append( ( col_name, stat_name, None, np.int64 if stat_name in self.counts else np.float64 ) )
+
+                histogram = f'{output_name}_{band_name}_histogram' if band_values.get( 'histogram' ) is not None else None
+                bands.append( ( output_name, band_name, columns, histogram ) )
+
+        self._bands = bands
+        return True
+
+
+    def parse( self, data ):
+
+        """
+        transform response into a pandas.DataFrame using compiled column layout
+        """
+
+        columns = self.parseColumns( data )
+        if columns is None:
+            return None
+
+        df = pd.DataFrame( columns, copy=False )
+        if self.histogram_edges:
+            df.attrs[ 'histogram_edges' ] = dict( self.histogram_edges )
+
+        return df
+
+
+    def parseColumns( self, data ):
+
+        """
+        transform response into dict of column arrays - None if layout cannot be parsed
+        """
+
+        if len( data[ 'data' ] ) == 0:
+            return {}
+
+        # compile layout from first response with valid rows
+        if self._bands is None and not self.compile( data ):
+            return {}
+
+        try:
+            return self.parseItems( data[ 'data' ] )
+
+        except ( KeyError, TypeError, ValueError ):
+
+            # layout differs from compiled schema - recompile from this response and retry once
+            try:
+                if self.compile( data ):
+                    return self.parseItems( data[ 'data' ] )
+
+            except ( KeyError, TypeError, ValueError ):
+                pass
+
+            self._bands = None
+            return None
+
+
+    def parseItems( self, items ):
+
+        """
+        fill columns from response items
+        """
+
+        # band dictionaries per item - rows with any empty band are invalid
+        band_values = []
+        valid = np.ones( len( items ), dtype=bool )
+        for output_name, band_name, columns, histogram in self._bands:
+
+            values = [ item['outputs'][output_name]['bands'][band_name] for item in items ]
+            valid &= np.fromiter( ( v['stats']['sampleCount'] != v['stats']['noDataCount'] for v in values ), dtype=bool, count=len( items ) )
+            band_values.append( values )
+
+        # retain valid rows
+        rows = np.flatnonzero( valid )
+        n = len( rows )
+
+        # parse data aggregation timeframe - date part of iso timestamps
+        data_columns = {}
+        data_columns[ 'interval_from' ] = np.array( [ date.fromisoformat( items[ idx ][ 'interval' ][ 'from' ][ : 10 ] ) for idx in rows ], dtype=object )
+        data_columns[ 'interval_to' ] = np.array( [ date.fromisoformat( items[ idx ][ 'interval' ][ 'to' ][ : 10 ] ) for idx in rows ], dtype=object )
+
+        # fill preallocated columns band by band
+        for ( output_name, band_name, columns, histogram ), values in zip( self._bands, band_values ):
+
+            stats = [ values[ idx ]['stats'] for idx in rows ]
+            for col_name, stat_name, perc, dtype in columns:
+
+                if perc is None:
+                    data_columns[ col_name ] = np.fromiter( ( s[ stat_name ] for s in stats ), dtype=dtype, count=n )
+                else:
+                    data_columns[ col_name ] = np.fromiter( ( s[ stat_name ][ perc ] for s in stats ), dtype=dtype, count=n )
+
+            # response includes histogram analysis
+            if histogram is not None:
+
+                histograms = [ values[ idx ][ 'histogram' ] for idx in rows ]
+                if self._histogram == 'compact':
+
+                    # fixed width count arrays - bin edges held once per band
+                    counts, edges = getCompactHistograms( histograms )
+                    self.setHistogramEdges( histogram, edges )
+
+                    data_columns[ histogram ] = list( counts )
+                    data_columns[ f'{histogram}_normalised' ] = list( normaliseCounts( counts ) )
+
+                else:
+                    data_columns[ histogram ] = [ getHistogram( h ) for h in histograms ]
+
+        return data_columns
+
+
+    def setHistogramEdges( self, column, edges ):
+
+        """
+        record shared bin edges for histogram column
+        """
+
+        if len( edges ) == 0:
+            return
+
+        # compact storage requires identical bin edges across shots
+        shared = self.histogram_edges.get( column, edges[ 0 ] )
+        if edges.shape[ 1 ] != len( shared ) or not np.allclose( edges, shared ):
+            raise HistogramError( f'{column} bin edges vary between shots - use raw histogram mode' )
+
+        self.histogram_edges[ column ] = list( shared )
+        return
+
+
+def isValid( item ):
+
+    """
+    item holds data for every band
+    """
+
+    return all( band[ 'stats' ][ 'sampleCount' ] != band[ 'stats' ][ 'noDataCount' ] 
+                    for output in item[ 'outputs' ].values() for band in output[ 'bands' ].values() )
+
+
+def isCompatible( shared, edges ):
+
+    """
+    bin edges agree with shared edges for every column held in both
+    """
+
+    for column, values in edges.items():
+        if column in shared and ( len( shared[ column ] ) != len( values ) or not np.allclose( shared[ column ], values ) ):
+            return False
+
+    return True
+
+
+def concatColumns( frames ):
+
+    """
+    concatenate dicts of column arrays - columns missing from a frame filled with None
+    """
+
+    names = list( dict.fromkeys( name for frame in frames for name in frame ) )
+    sizes = [ len( next( iter( frame.values() ) ) ) if frame else 0 for frame in frames ]
+
+    data = {}
+    for name in names:
+
+        parts = [ frame[ name ] if name in frame else np.full( n, None, dtype=object ) for frame, n in zip( frames, sizes ) ]
+
+        # histogram columns held as lists of arrays or dicts
+        if any( isinstance( part, list ) for part in parts ):
+            data[ name ] = [ value for part in parts for value in part ]
+        else:
+            data[ name ] = np.concatenate( parts )
+
+    return data
+
+
+def getCompactHistograms( histograms ):
+
+    """
+    convert bins dicts into count and bin edge matrices
+    """
+
+    bins = [ h[ 'bins' ] for h in histograms ]
+    counts = np.array( [ [ b[ 'count' ] for b in row ] for row in bins ], dtype=np.int32 )
+    edges = np.array( [ [ b[ 'lowEdge' ] for b in row ] + [ row[ -1 ][ 'highEdge' ] ] for row in bins ], dtype=np.float64 )
+
+    return counts.reshape( len( bins ), -1 ), edges.reshape( len( bins ), -1 )
+
+
+def normaliseCounts( counts ):
+
+    """
+    vectorised percentage of total counts per row
+    """
+
+    totals = counts.sum( axis=1, keepdims=True )
+    normalised = np.divide( 100 * counts, totals, out=np.zeros( counts.shape ), where=totals > 0 )
+
+    return np.rint( normalised ).astype( np.int16 )
+
+
+def getHistogram( histogram ):
+
+    """
+    augment raw histogram with normalised counts, total counts and bin edges
+    """
+
+    # add normalised counts
+    counts = [ value[ 'count' ] for value in histogram[ 'bins' ] ]
+    total_counts = sum(counts)
+
+    histogram[ 'normalised_counts' ] = [ round(100 * count / total_counts) if total_counts > 0 else 0 for count in counts ]
+    histogram[ 'total_counts' ] = total_counts
+
+    # add bin edges into array for easy access
+    edges = [ value[ 'lowEdge' ] for value in histogram[ 'bins' ] ]
+    edges.append( histogram[ 'bins' ][ -1 ][ 'highEdge'] )
+    histogram[ 'bin_edges'] = edges
+
+    return histogram
@@ -0,0 +1,391 @@
+import os
+import json
+import glob
+import uuid
+import shutil
+import pandas as pd
+import geopandas as gpd
+
+from sqlalchemy import create_engine, inspect, text
+
+from manifest import Manifest
+from bulkwriter import BulkWriter
+from statsparser import HistogramError, isCompatible
+
+# optional geoparquet backend
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = ds = None
+
+
+def getEngine( config ):
+
+    """
+    getEngine
+    """
+
+    # set up database connection engine
+    server = config.server
+    connection = 'postgresql://{user}:{password}@{host}:{port}/{database}'.format( user=server.user,
+                                                                                    password=server.password,
+                                                                                    host=server.host,
+                                                                                    port=server.port,
+                                                                                    database=server.database )
+    return create_engine( connection )
+
+
+def getStore( config, engine=None, schema=None ):
+
+    """
+    create storage backend from optional storage section of database configuration
+    """
+
+    options = config.get( 'storage' ) or {}
+    if options.get( 'backend', 'postgis' ) == 'parquet':
+        return ParquetStore( options.get( 'path' ) )
+
+    # default to postgis
+    if engine is None:
+        engine = getEngine( config )
+
+    return PostgisStore( engine, schema if schema is not None else config.table.schema, config )
+
+
+class PostgisStore():
+
+    # sql equivalents of filter operators
+    operators = {   '==' : '=',
+                    '!=' : '<>',
+                    '>' : '>',
+                    '>=' : '>=',
+                    '<' : '<',
+                    '<=' : '<=' }
+
+
+    def __init__( self, engine, schema, config=None ):
+
+        """
+        constructor
+        """
+
+        self._engine = engine
+        self._schema = schema
+        self._config = config if config is not None else {}
+        return
+
+
+    @property
+    def engine( self ):
+
+        """
+        database connection engine
+        """
+
+        return self._engine
+
+
+    def write( self, df, name ):
+
+        """
+        bulk copy frame into table - named index written as column
+        """
+
+        writer = BulkWriter.fromConfig( self._engine, name, self._schema, self._config )
+        return writer.write( df, index=df.index.name is not None )
+
+
+    def read( self, name, columns=None, filters=None ):
+
+        """
+        read table with column projection and filters evaluated in database
+        """
+
+        # select columns
+        selection = '*' if columns is None else ', '.join( BulkWriter.quote( column ) for column in columns )
+        command = f'SELECT {selection} FROM {self.getTableName( name )}'
+
+        # bound parameter per filter condition
+        conditions, params = [], {}
+        for idx, ( column, op, value ) in enumerate( filters or [] ):
+
+            if op == 'in':
+                conditions.append( f'{BulkWriter.quote( column )} = ANY( :p{idx} )' )
+                value = list( value )
+            else:
+                conditions.append( f'{BulkWriter.quote( column )} {self.operators[ op ]} :p{idx}' )
+
+            params[ f'p{idx}' ] = value
+
+        if conditions:
+            command += ' WHERE ' + ' AND '.join( conditions )
+
+        # geometry column decoded by geopandas
+        if 'geometry' in self.getColumns( name ) and ( columns is None or 'geometry' in columns ):
+            return gpd.GeoDataFrame.from_postgis( text( command ), self._engine, geom_col='geometry', params=params )
+
+        return pd.read_sql( text( command ), self._engine, params=params )
+
+
+    def getColumns( self, name ):
+
+        """
+        column names of table
+        """
+
+        return [ c[ 'name' ] for c in inspect( self._engine ).get_columns( name, schema=self._schema ) ]
+
+
+    def delete( self, name, filename ):
+
+        """
+        remove rows originating from file
+        """
+
+        if inspect( self._engine ).has_table( name, schema=self._schema ):
+            with self._engine.begin() as connection:
+                connection.execute( text( f'DELETE FROM {self.getTableName( name )} WHERE filename = :filename' ), { 'filename' : filename } )
+
+        return
+
+
+    def writeBinEdges( self, name, edges ):
+
+        """
+        upsert shared histogram bin edges into metadata table
+        """
+
+        table = self.getTableName( f'{name}_histogram_bins' )
+        with self._engine.begin() as connection:
+
+            connection.execute( text( f'CREATE TABLE IF NOT EXISTS {table} ( column_name TEXT PRIMARY KEY, bin_edges DOUBLE PRECISION[] )' ) )
+            for column, values in edges.items():
+
+                # first edges stored win - counts written against differing edges would be meaningless
+                connection.execute( text( f'INSERT INTO {table} VALUES ( :column, :edges ) ON CONFLICT ( column_name ) DO NOTHING' ),
+                                    { 'column' : column, 'edges' : list( values ) } )
+
+                stored = connection.execute( text( f'SELECT bin_edges FROM {table} WHERE column_name = :column' ), { 'column' : column } ).scalar()
+                if not isCompatible( { column : stored }, { column : values } ):
+                    raise HistogramError( f'{column} bin edges differ from edges stored in {table}' )
+
+        return
+
+
+    def getManifest( self, name ):
+
+        """
+        ingest manifest held alongside data tables
+        """
+
+        return Manifest( self._engine, name, schema=self._schema )
+
+
+    def getTableName( self, name ):
+
+        """
+        schema qualified table name
+        """
+
+        return f'{self._schema}.{name}' if self._schema is not None else name
+
+
+class ParquetStore():
+
+    def __init__( self, path ):
+
+        """
+        constructor
+        """
+
+        # one hive partitioned dataset per table name
+        self._path = path
+        os.makedirs( path, exist_ok=True )
+        return
+
+
+    def write( self, df, name, partition_cols=None ):
+
+        """
+        append frame to partitioned geoparquet dataset
+        """
+
+        if len( df ) == 0:
+            return 0
+
+        # named index written as column
+        if df.index.name is not None:
+            df = df.reset_index()
+
+        # default partitioning - acquisition date then granule
+        if partition_cols is None:
+            df, partition_cols = self.getPartitions( df )
+
+        # unique basename so concurrent writers append rather than overwrite
+        ds.write_dataset(   self.toArrow( df ),
+                            os.path.join( self._path, name ),
+                            format='parquet',
+                            partitioning=partition_cols,
+                            partitioning_flavor='hive',
+                            basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+                            existing_data_behavior='overwrite_or_ignore' )
+
+        return len( df )
+
+
+    def read( self, name, columns=None, filters=None ):
+
+        """
+        read dataset with column projection and filters pushed down to partitions and row groups
+        """
+
+        dataset = ds.dataset( os.path.join( self._path, name ), format='parquet', partitioning='hive' )
+        table = dataset.to_table( columns=columns, filter=self.getExpression( filters ) )
+
+        return self.fromArrow( table, dataset.schema.metadata )
+
+
+    def getColumns( self, name ):
+
+        """
+        column names of dataset including partition columns
+        """
+
+        return ds.dataset( os.path.join( self._path, name ), format='parquet', partitioning='hive' ).schema.names
+
+
+    def delete( self, name, filename ):
+
+        """
+        remove granule partitions originating from file
+        """
+
+        for pathname in glob.glob( os.path.join( self._path, name, '*', f'filename={filename}' ) ):
+            shutil.rmtree( pathname )
+
+        return
+
+
+    def writeBinEdges( self, name, edges ):
+
+        """
+        merge shared histogram bin edges into json sidecar
+        """
+
+        pathname = os.path.join( self._path, f'{name}_histogram_bins.json' )
+
+        values = {}
+        if os.path.exists( pathname ):
+            with open( pathname, 'r' ) as f:
+                values = json.load( f )
+
+        # first edges stored win - counts written against differing edges would be meaningless
+        if not isCompatible( values, edges ):
+            raise HistogramError( f'bin edges differ from edges stored in {pathname}' )
+
+        values.update( { column : list( edges ) for column, edges in edges.items() if column not in values } )
+        with open( pathname, 'w' ) as f:
+            json.dump( values, f, indent=4 )
+
+        return
+
+
+    def getManifest( self, name ):
+
+        """
+        ingest manifest held in local sqlite database
+        """
+
+        engine = create_engine( 'sqlite:///{}'.format( os.path.join( self._path, 'manifest.sqlite' ) ) )
+        return Manifest( engine, name )
+
+
+    @staticmethod
+    def getPartitions( df ):
+
+        """
+        derive date partition column from gedi or sentinel timestamps
+        """
+
+        partition_cols = []
+        for column in [ 'datetime', 'interval_from' ]:
+            if column in df.columns:
+                df = df.assign( date=pd.to_datetime( df[ column ] ).dt.strftime( '%Y-%m-%d' ) )
+                partition_cols.append( 'date' )
+                break
+
+        if 'filename' in df.columns:
+            partition_cols.append( 'filename' )
+
+        return df, partition_cols
+
+
+    @staticmethod
+    def getExpression( filters ):
+
+        """
+        convert ( column, operator, value ) filters into dataset expression
+        """
+
+        expression = None
+        for column, op, value in filters or []:
+
+            field = ds.field( column )
+            condition = {   '==' : lambda: field == value,
+                            '!=' : lambda: field != value,
+                            '>' : lambda: field > value,
+                            '>=' : lambda: field >= value,
+                            '<' : lambda: field < value,
+                            '<=' : lambda: field <= value,
+                            'in' : lambda: field.isin( list( value ) ) }[ op ]()
+
+            expression = condition if expression is None else expression & condition
+
+        return expression
+
+
+    @staticmethod
+    def toArrow( df ):
+
+        """
+        convert frame to arrow table - geometry encoded as wkb with geoparquet metadata
+        """
+
+        geo = None
+        if isinstance( df, gpd.GeoDataFrame ):
+
+            name = df.geometry.name
+            geo = { 'version' : '1.0.0',
+                    'primary_column' : name,
+                    'columns' : { name : {  'encoding' : 'WKB',
+                                            'geometry_types' : sorted( df.geom_type.dropna().unique().tolist() ),
+                                            'crs' : df.crs.to_json_dict() if df.crs is not None else None } } }
+
+            df = pd.DataFrame( df ).assign( **{ name : df.geometry.to_wkb() } )
+
+        table = pa.Table.from_pandas( df, preserve_index=False )
+        if geo is not None:
+            table = table.replace_schema_metadata( { **( table.schema.metadata or {} ), b'geo' : json.dumps( geo ).encode() } )
+
+        return table
+
+
+    @staticmethod
+    def fromArrow( table, metadata ):
+
+        """
+        convert arrow table to frame - wkb geometry decoded in bulk
+        """
+
+        df = table.to_pandas()
+
+        geo = json.loads( metadata[ b'geo' ] ) if metadata is not None and b'geo' in metadata else None
+        if geo is not None and geo[ 'primary_column' ] in df.columns:
+
+            name = geo[ 'primary_column' ]
+            crs = geo[ 'columns' ][ name ].get( 'crs' )
+            df[ name ] = gpd.GeoSeries.from_wkb( df[ name ], crs=json.dumps( crs ) if crs is not None else None )
+            return gpd.GeoDataFrame( df, geometry=name )
+
+        return df